@@ -0,0 +1,94 @@
+# asgi.py
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import app as flask_app
+from llm_client import get_llm_client
+from metrics import ASGIRequestMetrics
+
+# The LLM-bound JSON endpoints are served natively: while a request waits on
+# Groq or Ollama it holds no server thread, only a slot in the LLM client's
+# bounded pool. Every other route is the Flask app, mounted below.
+NATIVE_ROUTES = ["/query_data", "/generate_questions_from_text"]
+
+app = FastAPI()
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])  # Same as the Flask app's CORS(app)
+# The mounted Flask app records its own requests; these are the native ones
+app.add_middleware(ASGIRequestMetrics, routes=NATIVE_ROUTES)
+
+
+async def json_body(request: Request) -> dict:
+    """The parsed JSON body, or {} when it is missing or not a JSON object (like get_json(silent=True) or {})."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def wants_stream(request: Request, data: dict) -> bool:
+    flag = str(data.get("stream", "")).lower()
+    return flag in ("1", "true", "yes") or request.headers.get("accept", "").startswith("text/event-stream")
+
+
+@app.post("/query_data")
+async def query_data(request: Request):
+    try:
+        started = time.perf_counter()
+        data = await json_body(request)
+
+        # Embedding and search are CPU-bound; keep them off the event loop
+        plan = await run_in_threadpool(flask_app.plan_query, data)
+        if "error" in plan:
+            return JSONResponse({"error": plan["error"]}, status_code=plan["status"])
+
+        if wants_stream(request, data):
+            return StreamingResponse(
+                iterate_in_threadpool(flask_app.sse_events(flask_app.query_stream(plan), started, label=request.url.path)),
+                media_type="text/event-stream",
+                headers=flask_app.SSE_HEADERS,
+            )
+
+        if plan["cached"] is not None:
+            return JSONResponse({"response": plan["cached"], "cached": True})
+
+        prompt, backend, options = flask_app.llm_args(plan["results"], plan["model"])
+        refined_response = await get_llm_client().acomplete(prompt, backend, plan["use_cache"], **options)
+        flask_app.remember_answer(plan, refined_response)
+
+        return JSONResponse({"response": refined_response})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/generate_questions_from_text")
+async def generate_questions_from_text(request: Request):
+    try:
+        data = await json_body(request)
+
+        if not data or "text" not in data:
+            return JSONResponse({"error": "Missing 'text' in request body"}, status_code=400)
+
+        prompt, backend, options = flask_app.llm_args(flask_app.build_questions_prompt(data["text"]), "groq")
+        questions = (await get_llm_client().acomplete(prompt, backend, flask_app.cache_enabled(data), **options)).strip()
+
+        try:
+            questions_json = json.loads(questions)
+        except json.JSONDecodeError:
+            print(f"❌ JSON decoding failed: {questions}")
+            questions_json = []
+
+        return JSONResponse({"questions": questions_json})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+app.mount("/", WSGIMiddleware(flask_app.app))
@@ -0,0 +1 @@
+# Benchmarks; run from the backend directory, e.g. `python -m benchmarks.bench_extraction`.
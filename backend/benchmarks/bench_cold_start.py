@@ -0,0 +1,103 @@
+# benchmarks/bench_cold_start.py
+"""
+Cold-start time of `import app`, with per-module import timings.
+
+Each run starts a fresh interpreter with `-X importtime`, so nothing is
+shared between runs. The slowest modules (cumulative microseconds, as
+reported by Python) are listed for the last run. The benchmark fails when the
+median wall time exceeds the budget or when a heavy dependency that should
+only be imported on first use is loaded at import time.
+
+    python -m benchmarks.bench_cold_start --repeat 5 --top 15
+    COLD_START_BUDGET=1.0 python -m benchmarks.bench_cold_start
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table
+
+COLD_START_BUDGET = float(os.getenv("COLD_START_BUDGET", "1.5"))
+# Top-level packages that must not be imported by `import app`.
+HEAVY_MODULES = [
+    "langchain", "chromadb", "sentence_transformers", "torch", "fitz", "tiktoken",
+    "faiss", "nltk", "scipy", "PIL", "reportlab", "pandas",
+]
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+# Printed by the child after importing app: which heavy packages ended up loaded.
+PROBE = "import json, sys, {module}; print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))))"
+
+
+def import_once(module: str) -> tuple[float, list[dict], list[str]]:
+    """Import `module` in a fresh interpreter; returns wall seconds, per-module timings and heavy modules loaded."""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=backend,
+        capture_output=True,
+        text=True,
+    )
+    seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"`import {module}` failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            timings.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            })
+    heavy = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, timings, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app", help="Module to import.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list.")
+    parser.add_argument("--budget", type=float, default=COLD_START_BUDGET, help="Maximum median seconds.")
+    args = parser.parse_args()
+
+    runs = [import_once(args.module) for _ in range(args.repeat)]
+    wall = [seconds for seconds, _, _ in runs]
+    _, timings, heavy = runs[-1]
+
+    # One row per top-level package: its first import's cumulative time includes its submodules.
+    roots = {}
+    for timing in timings:
+        root = timing["module"].split(".")[0]
+        if timing["cumulative_ms"] > roots.get(root, {}).get("cumulative_ms", -1):
+            roots[root] = {**timing, "module": root}
+    slowest = sorted(roots.values(), key=lambda t: t["cumulative_ms"], reverse=True)[:args.top]
+    print_table(slowest, ["module", "cumulative_ms", "self_ms"])
+
+    median = statistics.median(wall)
+    print()
+    print(f"import {args.module}: median {median * 1000:.0f} ms over {len(wall)} runs "
+          f"(min {min(wall) * 1000:.0f} ms, max {max(wall) * 1000:.0f} ms), budget {args.budget * 1000:.0f} ms")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(heavy)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: cold start is over budget by {(median - args.budget) * 1000:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
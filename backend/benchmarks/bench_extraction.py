@@ -0,0 +1,79 @@
+# benchmarks/bench_extraction.py
+"""
+Ingestion latency for .txt and .docx uploads: the old render-to-PDF-then-OCR
+round trip versus direct extraction in load_documents.
+
+OCR runs against the local OCR.space stand-in with `--ocr-latency` seconds per
+request, so the comparison works offline. The DOCX render path needs docx2pdf
+(Microsoft Word) and is reported as unavailable without it.
+
+    python -m benchmarks.bench_extraction --paragraphs 400 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+
+import app
+import ocr
+from benchmarks.common import print_table, summarize, time_call
+from standins import ocr_space
+
+
+def make_samples(directory: str, paragraphs: int) -> dict:
+    import docx
+
+    lines = [
+        f"Paragraph {i}: time division duplexing shares one band between uplink and downlink traffic."
+        for i in range(paragraphs)
+    ]
+    txt_path = os.path.join(directory, "sample.txt")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+    docx_path = os.path.join(directory, "sample.docx")
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(docx_path)
+    return {".txt": txt_path, ".docx": docx_path}
+
+
+def render_and_ocr(path: str) -> str:
+    pdf_path = app.convert_to_pdf(path)
+    return ocr.extract_text_from_pdf(pdf_path, app.OCR_API_KEY, use_cache=False)
+
+
+def direct(path: str) -> str:
+    return "\n".join(doc.page_content for doc in app.load_documents(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ocr-latency", type=float, default=1.0, help="Seconds the OCR stand-in waits per page.")
+    args = parser.parse_args()
+
+    server, ocr.OCR_SPACE_URL = ocr_space.start(latency=args.ocr_latency)
+    # The OCR stand-in accepts any key
+    app.OCR_API_KEY = app.OCR_API_KEY or "standin"
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for ext, path in make_samples(directory, args.paragraphs).items():
+                for name, fn in (("render+ocr", render_and_ocr), ("direct", direct)):
+                    try:
+                        chars = len(fn(path))
+                        stats = summarize(time_call(lambda: fn(path), args.repeat))
+                    except Exception as e:
+                        rows.append({"format": ext, "path": name, "median_ms": f"unavailable ({type(e).__name__})"})
+                        continue
+                    rows.append({"format": ext, "path": name, "chars": chars, **stats})
+    finally:
+        server.shutdown()
+
+    print_table(rows, ["format", "path", "chars", "runs", "median_ms", "min_ms", "max_ms"])
+
+
+if __name__ == "__main__":
+    main()
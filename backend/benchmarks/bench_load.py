@@ -0,0 +1,285 @@
+# benchmarks/bench_load.py
+"""
+End-to-end load test of the eight Flask routes against local service stand-ins.
+
+OCR.space, Groq and Ollama are replaced by the stand-ins in standins/, each
+with its own latency and a shared failure rate, so the run works offline and
+is repeatable. Each route gets `--requests` timed requests from
+`--concurrency` client threads, after `--warmup` untimed ones. For each route
+the benchmark reports p50/p95/p99 latency, requests per second, errors and the
+server's peak RSS while that route was under load.
+
+Uploads differ per request and LLM caches are bypassed, so the uncached
+path is measured; `--cache` sends identical uploads and allows caching.
+
+By default the app is served in this process by a threaded werkzeug server.
+`--url` drives a server that is already running instead (e.g. serve.py). Start
+it with OCR_SPACE_URL, GROQ_API_URL and OLLAMA_HOST pointing at stand-ins,
+and pass `--pid` to sample its memory, including its worker processes.
+
+    python -m benchmarks.bench_load --concurrency 8 --requests 40
+    python -m benchmarks.bench_load --routes query_data generate_questions_from_text --model llama
+    python -m benchmarks.bench_load --url http://127.0.0.1:5000 --pid 12345 --csv load.csv
+"""
+import argparse
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import percentile, print_table
+
+QUERIES = [
+    "Is TDD used in 5G?",
+    "What is the principle of superposition of waves?",
+    "How does WiMAX allocate uplink and downlink time slots?",
+    "Why is TDD efficient in mmWave bands?",
+]
+PARAGRAPH = (
+    "Time division duplexing shares one frequency band between uplink and downlink traffic. "
+    "Time slots are allocated dynamically depending on network load, which suits asymmetric traffic."
+)
+
+
+def make_pdf(pages: int, salt: str) -> bytes:
+    """A PDF whose even pages have a text layer and odd pages are blank, so half of them go to OCR."""
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i % 2 == 0:
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"Page {i + 1} ({salt}).\n" + "\n".join([PARAGRAPH] * 6))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class Client:
+    """Builds each route's request as (path, requests keyword arguments); `salt` makes uploads unique unless caching is being measured."""
+
+    def __init__(self, base_url: str, model: str, pages: int, cache: bool):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.pages = pages
+        self.cache = cache
+        self._local = threading.local()
+        self._pdf = make_pdf(pages, "shared")
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def salt(self, i: int) -> str:
+        return "shared" if self.cache else f"{os.getpid()}-{i}-{time.time_ns()}"
+
+    def pdf(self, i: int) -> tuple:
+        data = self._pdf if self.cache else make_pdf(self.pages, self.salt(i))
+        return (f"load-{i}.pdf", data, "application/pdf")
+
+    def form(self, **fields) -> dict:
+        return {"model": self.model, "no_cache": "false" if self.cache else "true", **fields}
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.session.post(self.base_url + path, timeout=600, **kwargs)
+
+    def generate_data_store(self, i: int):
+        text = f"Upload {self.salt(i)}\n\n" + "\n\n".join([PARAGRAPH] * 20)
+        files = {"file": (f"load-{i if not self.cache else 0}.txt", text.encode("utf-8"), "text/plain")}
+        return "/generate_data_store", dict(files=files, data={"wait": "true"})
+
+    def query_data(self, i: int):
+        return "/query_data", dict(json=self.form(query_text=QUERIES[i % len(QUERIES)]))
+
+    def summarize(self, i: int):
+        return "/summarize", dict(files={"file": self.pdf(i)}, data=self.form())
+
+    def expand(self, i: int):
+        return "/expand", dict(files={"file": self.pdf(i)}, data=self.form())
+
+    def summarize_ocr(self, i: int):
+        return "/summarize_ocr", dict(files={"file": self.pdf(i)}, data=self.form())
+
+    def expand_ocr(self, i: int):
+        return "/expand_ocr", dict(files={"file": self.pdf(i)}, data=self.form(desired_character_count="1000"))
+
+    def generate_questions(self, i: int):
+        return "/generate_questions", dict(files={"file": self.pdf(i)}, data=self.form())
+
+    def generate_questions_from_text(self, i: int):
+        return "/generate_questions_from_text", dict(json=self.form(text=f"{self.salt(i)}\n" + "\n".join([PARAGRAPH] * 10)))
+
+
+ROUTES = [
+    "generate_data_store", "query_data", "summarize", "expand",
+    "summarize_ocr", "expand_ocr", "generate_questions", "generate_questions_from_text",
+]
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident memory of `pid` and its child processes (e.g. gunicorn workers), or 0 without /proc."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class RSSSampler:
+    """Samples the server's RSS on a background thread and keeps the peak since the last `reset`."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes(self.pid))
+            self._stop.wait(self.interval)
+
+    def reset(self):
+        self.peak = rss_bytes(self.pid)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_route(client: Client, route: str, requests_count: int, concurrency: int, warmup: int, sampler: RSSSampler) -> dict:
+    call = getattr(client, route)
+
+    def timed(i: int):
+        path, kwargs = call(i)
+        started = time.perf_counter()
+        try:
+            response = client.post(path, **kwargs)
+            error = None if response.status_code < 400 else f"HTTP {response.status_code}: {response.text[:200]}"
+        except requests.RequestException as e:
+            error = str(e)
+        return time.perf_counter() - started, error
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(-warmup, 0)))
+        if sampler is not None:
+            sampler.reset()
+        started = time.perf_counter()
+        results = list(pool.map(timed, range(requests_count)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, error in results if error is None]
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        print(f"{route}: {len(errors)} errors, e.g. {errors[0]}")
+    return {
+        "route": route,
+        "requests": len(results),
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": sampler.peak / 2 ** 20 if sampler is not None and sampler.peak else "n/a",
+    }
+
+
+def start_standins(args) -> list:
+    """Start the three stand-ins in this process and point the app's clients at them."""
+    import llm_client
+    import ocr
+    from standins import groq, ocr_space, ollama
+
+    common = {"failure_rate": args.failure_rate, "token_latency": args.token_latency}
+    ocr_server, ocr.OCR_SPACE_URL = ocr_space.start(latency=args.ocr_latency, **common)
+    groq_server, llm_client.GROQ_API_URL = groq.start(latency=args.groq_latency, **common)
+    ollama_server, llm_client.OLLAMA_HOST = ollama.start(latency=args.ollama_latency, **common)
+    return [ocr_server, groq_server, ollama_server]
+
+
+def start_app() -> tuple:
+    """Serve app.py on a threaded werkzeug server in this process; returns (server, base URL)."""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import app
+
+    # The OCR and Groq stand-ins accept any key
+    app.OCR_API_KEY = app.OCR_API_KEY or "standin"
+    app.GROQ_API_KEY = app.GROQ_API_KEY or "standin"
+    # One access-log line per request would drown the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--requests", type=int, default=20, help="Timed requests per route.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per route.")
+    parser.add_argument("--model", choices=["groq", "llama"], default="groq", help="LLM backend requested (llama = Ollama).")
+    parser.add_argument("--pages", type=int, default=4, help="Pages per uploaded PDF (half of them need OCR).")
+    parser.add_argument("--cache", action="store_true", help="Send identical uploads and allow LLM caching.")
+    parser.add_argument("--ocr-latency", type=float, default=0.3, help="Seconds the OCR stand-in takes per page.")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="Seconds before the Groq stand-in answers.")
+    parser.add_argument("--ollama-latency", type=float, default=1.0, help="Seconds before the Ollama stand-in answers.")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed tokens.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of stand-in requests answered with 503.")
+    parser.add_argument("--url", help="Drive this running server instead of serving app.py in-process.")
+    parser.add_argument("--pid", type=int, help="With --url: server process whose RSS (with children) is sampled.")
+    parser.add_argument("--csv", help="Also write the results to this CSV file.")
+    args = parser.parse_args()
+
+    servers = []
+    if args.url:
+        base_url, pid = args.url, args.pid
+    else:
+        servers = start_standins(args)
+        app_server, base_url = start_app()
+        servers.append(app_server)
+        pid = os.getpid()
+
+    sampler = RSSSampler(pid) if pid else None
+    client = Client(base_url, args.model, args.pages, args.cache)
+    rows = []
+    try:
+        for route in args.routes:
+            rows.append(run_route(client, route, args.requests, args.concurrency, args.warmup, sampler))
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        for server in servers:
+            server.shutdown()
+
+    columns = ["route", "requests", "errors", "p50_ms", "p95_ms", "p99_ms", "rps", "peak_rss_mb"]
+    print_table(rows, columns)
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} rows to {args.csv}.")
+
+
+if __name__ == "__main__":
+    main()
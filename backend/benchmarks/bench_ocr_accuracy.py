@@ -0,0 +1,152 @@
+# benchmarks/bench_ocr_accuracy.py
+"""
+OCR accuracy and latency over a directory of (scan, ground truth) pairs.
+
+Every scan (PDF or image) in `--data` needs a .txt file with the same name
+holding its expected text. If that text separates pages with form feeds
+(\\f) and the page count matches, it is scored page by page, otherwise as one
+document. Each scan goes through ocr.extract_pages once per engine
+configuration, with the OCR cache off. CER, WER and Levenshtein accuracy are
+then computed for all pairs in bulk, and page and document latency
+percentiles are reported per configuration.
+
+    python -m benchmarks.bench_ocr_accuracy --data ocr_eval --configs engine1 engine2
+    python -m benchmarks.bench_ocr_accuracy --data ocr_eval --standin --csv results.csv
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import ocr
+from benchmarks.common import percentile, print_table
+from levenshtein_accuracy import ocr_error_rates
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"}
+
+CONFIGS = {
+    "engine1": {**ocr.OCR_OPTIONS, "OCREngine": 1},
+    "engine2": {**ocr.OCR_OPTIONS, "OCREngine": 2},
+    "engine2-noscale": {**ocr.OCR_OPTIONS, "OCREngine": 2, "scale": False},
+    "engine2-table": {**ocr.OCR_OPTIONS, "OCREngine": 2, "isTable": True},
+}
+
+
+def find_pairs(directory: str) -> list[tuple[str, str]]:
+    """(scan path, ground-truth text) for every scan that has a matching .txt file."""
+    pairs = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        truth_path = os.path.join(directory, stem + ".txt")
+        if ext.lower() in IMAGE_EXTENSIONS | {".pdf"} and os.path.exists(truth_path):
+            with open(truth_path, "r", encoding="utf-8", errors="replace") as f:
+                pairs.append((os.path.join(directory, name), f.read()))
+    return pairs
+
+
+def as_pdf(path: str, directory: str) -> str:
+    """Path of a PDF for `path`, converting images into a one-page PDF."""
+    if os.path.splitext(path)[1].lower() == ".pdf":
+        return path
+    import fitz
+
+    with fitz.open(path) as image:
+        data = image.convert_to_pdf()
+    pdf_path = os.path.join(directory, os.path.basename(path) + ".pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(data)
+    return pdf_path
+
+
+def run_config(name: str, options: dict, scans: list[tuple[str, str, str]], api_key: str) -> tuple[dict, list[dict]]:
+    predicted, actual, labels = [], [], []
+    page_seconds, document_seconds = [], []
+    for scan_path, pdf_path, truth in scans:
+        started = time.perf_counter()
+        pages = ocr.extract_pages(pdf_path, api_key, use_cache=False, options=options)
+        document_seconds.append(time.perf_counter() - started)
+        page_seconds.extend(page.seconds for page in pages)
+
+        truth_pages = truth.split("\f")
+        if len(truth_pages) > 1 and len(truth_pages) == len(pages):
+            predicted.extend(page.text for page in pages)
+            actual.extend(truth_pages)
+            labels.extend(f"{os.path.basename(scan_path)}#{page.page + 1}" for page in pages)
+        else:
+            predicted.append("\n".join(page.text for page in pages))
+            actual.append(truth)
+            labels.append(os.path.basename(scan_path))
+
+    scores = ocr_error_rates(predicted, actual)
+    summary = {
+        "config": name,
+        "scans": len(scans),
+        "pages": len(page_seconds),
+        "page_p50_ms": percentile(page_seconds, 50) * 1000,
+        "page_p95_ms": percentile(page_seconds, 95) * 1000,
+        "page_p99_ms": percentile(page_seconds, 99) * 1000,
+        "doc_p50_ms": percentile(document_seconds, 50) * 1000,
+        "doc_p95_ms": percentile(document_seconds, 95) * 1000,
+        "cer": float(np.mean(scores["cer"])),
+        "wer": float(np.mean(scores["wer"])),
+        "accuracy": float(np.mean(scores["accuracy"])),
+    }
+    details = [
+        {"config": name, "item": label, "cer": cer, "wer": wer, "accuracy": accuracy}
+        for label, cer, wer, accuracy in zip(labels, scores["cer"], scores["wer"], scores["accuracy"])
+    ]
+    return summary, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data", required=True, help="Directory of scans with matching .txt ground truth.")
+    parser.add_argument("--configs", nargs="+", choices=sorted(CONFIGS), default=["engine2"])
+    parser.add_argument("--api-key", default=os.getenv("OCR_API_KEY"), help="OCR.space key (defaults to $OCR_API_KEY).")
+    parser.add_argument("--standin", action="store_true", help="Use the local OCR.space stand-in instead of the real service.")
+    parser.add_argument("--ocr-latency", type=float, default=0.0, help="Seconds the stand-in waits per page.")
+    parser.add_argument("--csv", help="Write per-page/per-scan scores to this CSV file.")
+    args = parser.parse_args()
+
+    pairs = find_pairs(args.data)
+    if not pairs:
+        print(f"No (scan, .txt) pairs found in {args.data}.")
+        return
+
+    server = None
+    if args.standin:
+        from standins import ocr_space
+
+        server, ocr.OCR_SPACE_URL = ocr_space.start(latency=args.ocr_latency)
+    elif not args.api_key:
+        parser.error("--api-key or $OCR_API_KEY is required unless --standin is used.")
+
+    rows, details = [], []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            scans = [(path, as_pdf(path, directory), truth) for path, truth in pairs]
+            for name in args.configs:
+                summary, config_details = run_config(name, CONFIGS[name], scans, args.api_key or "standin")
+                rows.append(summary)
+                details.extend(config_details)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print_table(rows, [
+        "config", "scans", "pages", "page_p50_ms", "page_p95_ms", "page_p99_ms",
+        "doc_p50_ms", "doc_p95_ms", "cer", "wer", "accuracy",
+    ])
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["config", "item", "cer", "wer", "accuracy"])
+            writer.writeheader()
+            writer.writerows(details)
+        print(f"Wrote {len(details)} rows to {args.csv}.")
+
+
+if __name__ == "__main__":
+    main()
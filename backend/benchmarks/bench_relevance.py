@@ -0,0 +1,106 @@
+# benchmarks/bench_relevance.py
+"""
+Cosine similarities of retrieved chunks, for choosing RELEVANCE_THRESHOLD.
+
+On-topic questions (built-in samples or one per line from `--queries`) and
+off-topic control questions are run through the dense and BM25 retrievers
+over the local index. For each group of hits (dense top-1, dense only, BM25
+only, both, and the off-topic top-1) the benchmark prints the similarity
+distribution and the share of hits each candidate threshold would keep. A
+good threshold keeps the on-topic groups and drops the off-topic top-1;
+BM25's top LEXICAL_KEEP hits are exempt from it at query time anyway.
+
+    python -m benchmarks.bench_relevance
+    python -m benchmarks.bench_relevance --queries questions.txt --thresholds 0.2 0.3 0.4 0.5
+"""
+import argparse
+
+from benchmarks.common import percentile, print_table
+from embeddings import get_embedding_service
+from ingest import index_generation
+from retrieval import HYBRID_CANDIDATES, cosine_similarities
+from sparse_index import get_sparse_index
+from vector_store import get_vector_store
+
+CHROMA_PATH = "chroma"
+COLLECTION_NAME = "documents"
+
+ON_TOPIC = [
+    "Is TDD used in 5G?",
+    "What is the principle of superposition of waves?",
+    "How does WiMAX allocate uplink and downlink time slots?",
+    "Why is TDD efficient in mmWave bands?",
+    "What is the difference between FDD and TDD?",
+]
+OFF_TOPIC = [
+    "What is a good recipe for chocolate cake?",
+    "Who won the football world cup in 1998?",
+    "How do I renew my passport?",
+    "What is the capital of Australia?",
+]
+
+
+def similarities_by_group(store, sparse, queries: list[str], candidates: int) -> dict:
+    """Similarity of every candidate to its query, grouped by which retrievers found it."""
+    embedder = get_embedding_service()
+    embeddings = embedder.encode_batch(queries)
+    dense = store.query(query_embeddings=embeddings.tolist(), n_results=candidates, include=["distances"])
+    lexical = sparse.search_many(queries, candidates)
+
+    groups = {"dense top-1": [], "dense only": [], "bm25 only": [], "both": []}
+    for embedding, dense_ids, sparse_hits in zip(embeddings, dense["ids"], lexical):
+        sparse_ids = [chunk_id for chunk_id, _ in sparse_hits]
+        wanted = list(dict.fromkeys(dense_ids + sparse_ids))
+        if not wanted:
+            continue
+        stored = store.get(ids=wanted, include=["embeddings"])
+        similarity = dict(zip(stored["ids"], cosine_similarities(embedding, stored["embeddings"])))
+        if dense_ids and dense_ids[0] in similarity:
+            groups["dense top-1"].append(float(similarity[dense_ids[0]]))
+        for chunk_id in wanted:
+            if chunk_id not in similarity:
+                continue
+            group = "both" if chunk_id in dense_ids and chunk_id in sparse_ids else "dense only" if chunk_id in dense_ids else "bm25 only"
+            groups[group].append(float(similarity[chunk_id]))
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", help="File with one on-topic question per line (default: built-in samples).")
+    parser.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES, help="Candidates per retriever.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.2, 0.3, 0.4, 0.5, 0.6, 0.7])
+    args = parser.parse_args()
+
+    queries = ON_TOPIC
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    store = get_vector_store(CHROMA_PATH, COLLECTION_NAME)
+    if store.count() == 0:
+        print("The index is empty; ingest documents first.")
+        return
+    sparse = get_sparse_index(COLLECTION_NAME, index_generation(CHROMA_PATH), store)
+
+    groups = similarities_by_group(store, sparse, queries, args.candidates)
+    groups["off-topic top-1"] = similarities_by_group(store, sparse, OFF_TOPIC, args.candidates)["dense top-1"]
+
+    rows = []
+    for group, values in groups.items():
+        row = {
+            "group": group,
+            "hits": len(values),
+            "p5": percentile(values, 5),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+        }
+        for threshold in args.thresholds:
+            row[f"kept@{threshold:g}"] = sum(value >= threshold for value in values) / len(values) if values else 0.0
+        rows.append(row)
+    print(f"{len(queries)} on-topic and {len(OFF_TOPIC)} off-topic questions, {args.candidates} candidates per retriever")
+    print_table(rows, ["group", "hits", "p5", "p50", "p95", *(f"kept@{threshold:g}" for threshold in args.thresholds)])
+
+
+if __name__ == "__main__":
+    main()
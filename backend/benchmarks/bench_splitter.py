@@ -0,0 +1,98 @@
+# benchmarks/bench_splitter.py
+"""
+Chunking speed and peak memory: LangChain's RecursiveCharacterTextSplitter
+versus splitter.StreamingTextSplitter in native, compat, sentence-aware and
+token modes.
+
+The input is a text file (e.g. a saved OCR output) or, by default, generated
+OCR-like text with short lines, paragraph breaks and long unbroken tokens.
+Compat mode is also checked to produce the same chunks and start_index values
+as LangChain.
+
+    python -m benchmarks.bench_splitter --chars 2000000 --repeat 3
+    python -m benchmarks.bench_splitter --file data/books/alice_in_wonderland.md
+"""
+import argparse
+import random
+import tracemalloc
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from benchmarks.common import print_table, summarize, time_call
+from splitter import StreamingTextSplitter
+
+
+def sample_text(chars: int, seed: int) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["the", "signal", "uplink", "carrier", "frequency", "band", "of", "and", "is", "a", "TDD", "FDD"]
+    parts, size = [], 0
+    while size < chars:
+        sentence = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 25))).capitalize() + "."
+        if rng.random() < 0.02:
+            sentence += " " + "-" * rng.randint(200, 600)
+        separator = rng.choice(["\n", " ", " ", "\n\n"])
+        parts.append(sentence + separator)
+        size += len(sentence) + len(separator)
+    return "".join(parts)[:chars]
+
+
+def peak_memory_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--file", help="Text file to split instead of generated text.")
+    parser.add_argument("--chars", type=int, default=1_000_000, help="Size of generated text.")
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        text = sample_text(args.chars, args.seed)
+    documents = [Document(page_content=text, metadata={"source": args.file or "generated"})]
+    size, overlap = args.chunk_size, args.chunk_overlap
+
+    splitters = {
+        "langchain": lambda: RecursiveCharacterTextSplitter(
+            chunk_size=size, chunk_overlap=overlap, length_function=len, add_start_index=True
+        ).split_documents(documents),
+        "streaming": lambda: StreamingTextSplitter(size, overlap).split_documents(documents),
+        "streaming compat": lambda: StreamingTextSplitter(size, overlap, compat=True).split_documents(documents),
+        "streaming sentences": lambda: StreamingTextSplitter(size, overlap, sentence_aware=True).split_documents(documents),
+        # Token sizing: roughly the same chunk length at ~4 characters per token
+        "streaming tokens": lambda: StreamingTextSplitter(size // 4, overlap // 4, length="tokens").split_documents(documents),
+    }
+
+    reference = splitters["langchain"]()
+    compat = splitters["streaming compat"]()
+    identical = [(d.page_content, d.metadata) for d in reference] == [(d.page_content, d.metadata) for d in compat]
+    print(f"{len(text)} characters; compat output identical to LangChain: {identical}")
+
+    rows = []
+    for name, split in splitters.items():
+        stats = summarize(time_call(split, args.repeat))
+        chunks = len(split())
+        rows.append({
+            "splitter": name,
+            "chunks": chunks,
+            "median_ms": stats["median_ms"],
+            "MB/s": len(text) / 1e6 / (stats["median_ms"] / 1000) if stats["median_ms"] else 0.0,
+            "peak_MB": peak_memory_mb(split),
+        })
+    print_table(rows, ["splitter", "chunks", "median_ms", "MB/s", "peak_MB"])
+
+
+if __name__ == "__main__":
+    main()
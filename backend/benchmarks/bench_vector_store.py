@@ -0,0 +1,118 @@
+# benchmarks/bench_vector_store.py
+"""
+Query latency, recall@K and memory of each vector store backend.
+
+Vectors come from the local Chroma collection (our corpus) unless
+`--synthetic N` asks for N random vectors instead. Each backend is built in a
+temporary directory; recall@K is measured against exact brute-force search,
+and memory is the growth in resident set size while building and querying.
+Backends whose packages are missing are reported as unavailable.
+
+    python -m benchmarks.bench_vector_store --queries 200 --k 3
+    python -m benchmarks.bench_vector_store --synthetic 100000 --backends numpy faiss-flat faiss-hnsw faiss-ivf
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import vector_store
+from benchmarks.common import percentile, print_table
+
+CHROMA_PATH = "chroma"
+COLLECTION_NAME = "documents"
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm", "r") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def load_corpus(synthetic: int, dimension: int, seed: int) -> np.ndarray:
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        return rng.standard_normal((synthetic, dimension), dtype=np.float32)
+    store = vector_store.ChromaStore(CHROMA_PATH, COLLECTION_NAME)
+    return np.asarray(store.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    distances = (queries ** 2).sum(1)[:, None] - 2.0 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def bench_backend(backend: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, batch_size: int) -> dict:
+    ids = [str(i) for i in range(len(vectors))]
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store.VECTOR_STORE_PATH = directory
+        rss_before = rss_bytes()
+        store = vector_store.create_store(backend, directory, "bench")
+
+        started = time.perf_counter()
+        for start in range(0, len(vectors), batch_size):
+            store.add(ids=ids[start:start + batch_size], embeddings=vectors[start:start + batch_size].tolist())
+        store.persist()
+        # The first query builds the FAISS index; count it as build time.
+        store.query(query_embeddings=queries[:1].tolist(), n_results=k)
+        build_seconds = time.perf_counter() - started
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            result = store.query(query_embeddings=[query.tolist()], n_results=k)
+            latencies.append(time.perf_counter() - t0)
+            hits += len({int(i) for i in result["ids"][0]} & set(expected.tolist()))
+
+        t0 = time.perf_counter()
+        store.query(query_embeddings=queries.tolist(), n_results=k)
+        batch_seconds = time.perf_counter() - t0
+        rss_after = rss_bytes()
+
+    return {
+        "backend": backend,
+        "build_s": build_seconds,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "batch_qps": len(queries) / batch_seconds if batch_seconds else 0.0,
+        f"recall@{k}": hits / truth.size,
+        "rss_mb": (rss_after - rss_before) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", choices=vector_store.BACKENDS, default=list(vector_store.BACKENDS))
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random vectors instead of the Chroma corpus.")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1024, help="Vectors per add call.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_corpus(args.synthetic, args.dimension, args.seed)
+    if len(vectors) == 0:
+        print("No vectors to benchmark; ingest documents first or pass --synthetic.")
+        return
+
+    # Queries are perturbed corpus vectors, like paraphrases of indexed text.
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, len(vectors), size=args.queries)
+    noise = rng.standard_normal((args.queries, vectors.shape[1]), dtype=np.float32)
+    queries = vectors[picks] + 0.1 * vectors.std() * noise
+    truth = exact_neighbours(vectors, queries, args.k)
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {args.queries} queries, k={args.k}")
+
+    rows = []
+    for backend in args.backends:
+        try:
+            rows.append(bench_backend(backend, vectors, queries, truth, args.k, args.batch_size))
+        except ImportError as e:
+            rows.append({"backend": backend, "build_s": f"unavailable ({e.name})"})
+    print_table(rows, ["backend", "build_s", "p50_ms", "p95_ms", "batch_qps", f"recall@{args.k}", "rss_mb"])
+
+
+if __name__ == "__main__":
+    main()
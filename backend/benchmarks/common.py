@@ -0,0 +1,44 @@
+# benchmarks/common.py
+import math
+import statistics
+import time
+
+
+def time_call(fn, repeat: int = 5) -> list[float]:
+    """Run `fn` `repeat` times and return the wall-clock seconds of each run."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (pct in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[rank]
+
+
+def summarize(timings: list[float]) -> dict:
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000 if timings else 0.0,
+        "min_ms": min(timings) * 1000 if timings else 0.0,
+        "max_ms": max(timings) * 1000 if timings else 0.0,
+    }
+
+
+def print_table(rows: list[dict], columns: list[str]):
+    """Print `rows` as a fixed-width table with the given column order."""
+    def fmt(value):
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    widths = [max(len(col), *(len(fmt(row.get(col, ""))) for row in rows)) for col in columns]
+    print("  ".join(col.ljust(width) for col, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(fmt(row.get(col, "")).ljust(width) for col, width in zip(columns, widths)))
@@ -0,0 +1,127 @@
+# context_assembler.py
+import os
+
+import numpy as np
+
+from summarizer import _slice_tokens, count_tokens
+
+# Token budget for retrieved context placed in the prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "768"))
+# Trade-off between relevance (1.0) and diversity (0.0) in maximal marginal relevance.
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Retrieval candidates considered per selected chunk.
+MMR_CANDIDATE_FACTOR = int(os.getenv("MMR_CANDIDATE_FACTOR", "4"))
+
+SEPARATOR = "\n\n---\n\n"
+
+
+def mmr_select(hits: list[dict], k: int, lambda_mult: float = MMR_LAMBDA) -> list[dict]:
+    """
+    Pick `k` hits by maximal marginal relevance.
+
+    Each step takes the hit maximizing
+    lambda * relevance - (1 - lambda) * max similarity(already picked),
+    so near-duplicate chunks are passed over in favour of new information.
+    Relevance is the hit's fused retrieval "score", min-max scaled to 0..1
+    over the candidates, so BM25's ranking counts as much as in retrieval;
+    hits without a score fall back to their cosine "similarity". Cosine
+    similarity between "embedding"s is used only for redundancy.
+    """
+    if len(hits) <= 1 or k <= 0:
+        return hits[:k]
+    matrix = np.asarray([hit["embedding"] for hit in hits], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    pairwise = matrix @ matrix.T
+    relevance = np.asarray([hit.get("score", hit["similarity"]) for hit in hits], dtype=np.float32)
+    spread = float(relevance.max() - relevance.min())
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(hits), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, len(hits)):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return [hits[i] for i in selected]
+
+
+def merge_spans(hits: list[dict]) -> list[dict]:
+    """
+    Merge hits that overlap or touch in the same source (and page) into single spans.
+
+    Uses the chunk's `start_index` metadata; hits without it are kept as they
+    are. Each span keeps the rank of its best-ranked member, its text with the
+    overlap removed, and the IDs of the chunks it covers.
+    """
+    spans, positioned = [], {}
+    for rank, hit in enumerate(hits):
+        metadata = hit["metadata"]
+        span = {"rank": rank, "text": hit["document"], "ids": [hit["id"]], "metadata": metadata}
+        if "start_index" not in metadata:
+            spans.append(span)
+            continue
+        span["start"] = int(metadata["start_index"])
+        span["end"] = span["start"] + len(hit["document"])
+        positioned.setdefault((metadata.get("source"), metadata.get("page")), []).append(span)
+
+    for group in positioned.values():
+        group.sort(key=lambda span: span["start"])
+        current = group[0]
+        for span in group[1:]:
+            if span["start"] <= current["end"]:
+                overlap = current["end"] - span["start"]
+                if span["end"] > current["end"]:
+                    current["text"] += span["text"][overlap:]
+                    current["end"] = span["end"]
+                current["ids"] += span["ids"]
+                current["rank"] = min(current["rank"], span["rank"])
+            else:
+                spans.append(current)
+                current = span
+        spans.append(current)
+
+    return sorted(spans, key=lambda span: span["rank"])
+
+
+def pack(spans: list[dict], budget: int = CONTEXT_TOKEN_BUDGET) -> list[dict]:
+    """Keep spans in rank order while they fit in `budget` tokens; the top span is truncated if it alone is too long."""
+    packed, used = [], 0
+    separator_tokens = count_tokens(SEPARATOR)
+    for span in spans:
+        tokens = count_tokens(span["text"]) + (separator_tokens if packed else 0)
+        if used + tokens <= budget:
+            packed.append(span)
+            used += tokens
+        elif not packed:
+            packed.append(dict(span, text=_slice_tokens(span["text"], budget)[0]))
+            break
+    return packed
+
+
+def assemble_context(hits: list[dict], k: int, budget: int = CONTEXT_TOKEN_BUDGET, lambda_mult: float = MMR_LAMBDA) -> dict:
+    """
+    Turn retrieval candidates into prompt context: MMR-select `k`, merge overlapping spans, pack to `budget` tokens.
+
+    Args:
+        hits (list[dict]): Candidates from hybrid_search, best first.
+        k (int): Chunks to select.
+        budget (int): Token budget for the joined context.
+        lambda_mult (float): MMR relevance/diversity trade-off.
+
+    Returns:
+        dict: "context" (the joined text), "sources" and "ids" of the chunks
+        that made it into the context, and its "tokens".
+    """
+    spans = pack(merge_spans(mmr_select(hits, k, lambda_mult)), budget)
+    context = SEPARATOR.join(span["text"] for span in spans)
+    return {
+        "context": context,
+        "sources": [span["metadata"].get("source", "Unknown") for span in spans],
+        "ids": [chunk_id for span in spans for chunk_id in span["ids"]],
+        "tokens": count_tokens(context),
+    }
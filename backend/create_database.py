@@ -1,14 +1,13 @@
+import argparse
 from langchain.document_loaders import DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from sentence_transformers import SentenceTransformer
-import chromadb
 import os
 from dotenv import load_dotenv
-import nltk
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('averaged_perceptron_tagger')
+from ingest import EMBED_BATCH_SIZE, WRITE_BATCH_SIZE, IngestStats, bump_index_generation, index_generation, index_write_lock, sync_chunks
+from sparse_index import get_sparse_index
+from splitter import StreamingTextSplitter
+from startup import check_nltk_data
+from vector_store import BACKENDS, VECTOR_BACKEND, get_vector_store
 
 # Load environment variables. Assumes that project contains .env file with API keys
 load_dotenv()
@@ -18,12 +17,20 @@ DATA_PATH = "data/books"
 COLLECTION_NAME = "documents"
 
 def main():
-    generate_data_store()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per model.encode call.")
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE, help="Chunks per collection.add call.")
+    parser.add_argument("--backend", choices=BACKENDS, default=VECTOR_BACKEND, help="Vector store to write to.")
+    args = parser.parse_args()
 
-def generate_data_store():
+    # DirectoryLoader's markdown parsing needs NLTK data; it is no longer downloaded on import
+    check_nltk_data()
+    generate_data_store(args.embed_batch_size, args.write_batch_size, args.backend)
+
+def generate_data_store(embed_batch_size: int = EMBED_BATCH_SIZE, write_batch_size: int = WRITE_BATCH_SIZE, backend: str = VECTOR_BACKEND):
     documents = load_documents()
     chunks = split_text(documents)
-    save_to_chroma(chunks)
+    save_to_chroma(chunks, embed_batch_size, write_batch_size, backend)
 
 def load_documents():
     # Load documents from the specified directory.
@@ -33,35 +40,40 @@ def load_documents():
 
 def split_text(documents: list[Document]):
     # Split the documents into smaller chunks for processing.
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = StreamingTextSplitter(
         chunk_size=300,
         chunk_overlap=100,
-        length_function=len,
-        add_start_index=True,
     )
     chunks = text_splitter.split_documents(documents)
     print(f"Split {len(documents)} documents into {len(chunks)} chunks.")
     return chunks
 
-def save_to_chroma(chunks: list[Document]):
-    # Initialize Chroma client
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_or_create_collection(COLLECTION_NAME)
-    
-    # Load sentence transformer model
-    model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-    
-    # Generate embeddings and add them to Chroma
-    for i, doc in enumerate(chunks):
-        embedding = model.encode(doc.page_content).tolist()
-        collection.add(
-            ids=[str(i)],  # Unique ID for each document
-            embeddings=[embedding],
-            metadatas=[doc.metadata],
-            documents=[doc.page_content]
-        )
-    
-    print(f"Saved {len(chunks)} chunks to ChromaDB at {CHROMA_PATH}.")
+def save_to_chroma(chunks: list[Document], embed_batch_size: int = EMBED_BATCH_SIZE, write_batch_size: int = WRITE_BATCH_SIZE, backend: str = VECTOR_BACKEND):
+    # Hold the index lock so a running server's ingests cannot interleave with this one
+    with index_write_lock(CHROMA_PATH):
+        # Open the vector store for the chosen backend
+        store = get_vector_store(CHROMA_PATH, COLLECTION_NAME, backend)
+        sparse = get_sparse_index(COLLECTION_NAME, index_generation(CHROMA_PATH), store)
+        
+        # Embed and write only new chunks; drop chunks the documents no longer contain
+        stats = IngestStats()
+        try:
+            sync_chunks(
+                store,
+                chunks,
+                embed_batch_size=embed_batch_size,
+                write_batch_size=min(write_batch_size, store.max_batch_size),
+                sparse_index=sparse,
+                stats=stats,
+            )
+        finally:
+            # Publish whatever reached the store, even if a later batch failed
+            if stats.changed:
+                store.persist()
+                sparse.persist()
+                bump_index_generation(CHROMA_PATH)
+
+    print(f"Saved {len(chunks)} chunks to the {backend} vector store.")
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,248 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
 import pandas as pd
 
-# Load the dataset (modify the file path accordingly)
-df = pd.read_csv("Suicide_Detection.csv")  # Use pd.read_excel() for Excel files
+# Defaults match the original script: the first 2000 rows of the Kaggle suicide detection dataset.
+CSV_PATH = "Suicide_Detection.csv"
+SHARD_PATH = "dataset_shards"
+CHROMA_PATH = "chroma"
+COLLECTION_NAME = "documents"
+CHUNKSIZE = 50_000
+TEXT_COLUMN = "text"
+# File inside the index directory listing the shards indexed from each dataset.
+MANIFEST_FILE = "dataset_manifest.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare a CSV dataset in bounded memory and optionally index it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prepare = subparsers.add_parser("prepare", help="Stream the CSV, report character/token stats and write shards.")
+    prepare.add_argument("csv_path", nargs="?", default=CSV_PATH)
+    prepare.add_argument("--nrows", type=int, default=None, help="Only read the first N rows (e.g. 2000).")
+    prepare.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Rows read and written per shard.")
+    prepare.add_argument("--out", default=None, help=f"Shard directory (e.g. {SHARD_PATH}); omit to only report stats.")
+    prepare.add_argument("--format", choices=["parquet", "npy"], default="parquet", help="Shard format.")
+    prepare.add_argument("--csv-out", default=None, help="Also write the rows read to this CSV (e.g. top_2000_entries.csv).")
+    prepare.add_argument("--text-column", default=TEXT_COLUMN, help="Column used for token statistics.")
+
+    index = subparsers.add_parser("index", help="Embed and index the text column of prepared shards.")
+    index.add_argument("shard_dir", nargs="?", default=SHARD_PATH)
+    index.add_argument("--text-column", default=TEXT_COLUMN)
+    index.add_argument("--backend", default=None, help="Vector store backend (defaults to VECTOR_BACKEND).")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        prepare_dataset(args.csv_path, args.nrows, args.chunksize, args.out, args.format, args.csv_out, args.text_column)
+    else:
+        index_shards(args.shard_dir, args.text_column, args.backend)
+
+
+def prepare_dataset(
+    csv_path: str = CSV_PATH,
+    nrows: int = None,
+    chunksize: int = CHUNKSIZE,
+    out_dir: str = None,
+    shard_format: str = "parquet",
+    csv_out: str = None,
+    text_column: str = TEXT_COLUMN,
+) -> dict:
+    """
+    Read `csv_path` in chunks, accumulate statistics and write one shard per chunk.
+
+    Only one chunk is in memory at a time. Character counts use vectorized
+    `.str.len()`; token counts are computed for `text_column` in batches.
+
+    Returns:
+        dict: Row count, characters per column, total characters and token statistics.
+    """
+    from summarizer import count_tokens_batch
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    rows = 0
+    characters = {}
+    token_counts = []
+    started = time.perf_counter()
+
+    reader = pd.read_csv(csv_path, nrows=nrows, chunksize=chunksize)
+    for shard_number, chunk in enumerate(reader):
+        if shard_number == 0:
+            print(chunk.head())
+        rows += len(chunk)
+        for column in chunk.columns:
+            # Same count as astype(str).applymap(len), without a Python call per cell
+            characters[column] = characters.get(column, 0) + int(chunk[column].astype(str).str.len().sum())
+        if text_column in chunk.columns:
+            texts = chunk[text_column].fillna("").astype(str).tolist()
+            token_counts.append(np.asarray(count_tokens_batch(texts), dtype=np.int64))
+
+        if out_dir:
+            write_shard(chunk, os.path.join(out_dir, f"shard-{shard_number:05d}"), shard_format)
+        if csv_out:
+            chunk.to_csv(csv_out, index=False, mode="w" if shard_number == 0 else "a", header=shard_number == 0)
+
+    tokens = np.concatenate(token_counts) if token_counts else np.empty(0, dtype=np.int64)
+    stats = {
+        "rows": rows,
+        "characters": characters,
+        "total_characters": sum(characters.values()),
+        "tokens": {
+            "total": int(tokens.sum()),
+            "mean": float(tokens.mean()) if tokens.size else 0.0,
+            "p50": float(np.percentile(tokens, 50)) if tokens.size else 0.0,
+            "p95": float(np.percentile(tokens, 95)) if tokens.size else 0.0,
+            "max": int(tokens.max()) if tokens.size else 0,
+        },
+    }
+    print(f"Read {rows} rows in {time.perf_counter() - started:.2f}s.")
+    print(f"Total number of characters: {stats['total_characters']}")
+    print(f"Tokens in '{text_column}': {json.dumps(stats['tokens'])}")
+    if out_dir:
+        with open(os.path.join(out_dir, "stats.json"), "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        print(f"Wrote {shard_format} shards to {out_dir}.")
+    return stats
+
+
+def write_shard(chunk: pd.DataFrame, prefix: str, shard_format: str):
+    """
+    Write `chunk` as `prefix`.parquet, or as memory-mappable .npy files.
+
+    In the npy layout numeric columns are stored as arrays. String columns
+    are stored as their concatenated UTF-8 bytes plus an int64 array of
+    offsets, so that rows can be read back without loading the whole column.
+    """
+    if shard_format == "parquet":
+        chunk.to_parquet(f"{prefix}.parquet", index=False)
+        return
+    os.makedirs(prefix, exist_ok=True)
+    for column in chunk.columns:
+        name = os.path.join(prefix, str(column))
+        values = chunk[column]
+        if pd.api.types.is_numeric_dtype(values):
+            np.save(f"{name}.npy", values.to_numpy())
+            continue
+        encoded = [text.encode("utf-8") for text in values.fillna("").astype(str)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        np.save(f"{name}.offsets.npy", offsets)
+        np.save(f"{name}.bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def read_shard_texts(path: str, column: str) -> list[str]:
+    """The `column` values of a parquet or npy shard; npy shards are read memory-mapped."""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=[column])[column].fillna("").astype(str).tolist()
+    offsets = np.load(os.path.join(path, f"{column}.offsets.npy"), mmap_mode="r")
+    data = np.load(os.path.join(path, f"{column}.bytes.npy"), mmap_mode="r")
+    return [bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def index_shards(shard_dir: str = SHARD_PATH, text_column: str = TEXT_COLUMN, backend: str = None):
+    """
+    Split, embed and index the texts of every shard, one shard at a time.
+
+    Chunks get stable IDs from the shard and row, so re-running updates
+    rather than duplicates. Chunks a shard no longer produces are deleted,
+    and so are all chunks of shards that have disappeared since the last run
+    (the indexed shards are recorded in a manifest next to the index). The
+    index lock is held throughout, like any other ingest. The vector store
+    and BM25 index are persisted and the index generation bumped at the end,
+    or after a failure if anything was already written.
+    """
+    from langchain.schema import Document
+
+    from ingest import IngestStats, batched, bump_index_generation, document_id, index_chunks, index_generation, index_write_lock
+    from sparse_index import get_sparse_index
+    from splitter import StreamingTextSplitter
+    from vector_store import VECTOR_BACKEND, get_vector_store
+
+    shards = sorted(glob.glob(os.path.join(shard_dir, "shard-*")))
+    if not shards:
+        print(f"No shards found in {shard_dir}; run `python dataset.py prepare --out {shard_dir}` first.")
+        return
+    dataset = os.path.basename(os.path.normpath(shard_dir))
+    text_splitter = StreamingTextSplitter(chunk_size=300, chunk_overlap=100)
+
+    # A running server may ingest at the same time: reload, update and persist under the index lock
+    with index_write_lock(CHROMA_PATH):
+        store = get_vector_store(CHROMA_PATH, COLLECTION_NAME, backend or VECTOR_BACKEND)
+        sparse = get_sparse_index(COLLECTION_NAME, index_generation(CHROMA_PATH), store)
+        manifest = load_manifest()
+        previous = set(manifest.get(dataset, []))
+        sources = []
+        stats = IngestStats()
+
+        def delete_document(doc_id: str, keep: set = frozenset()):
+            stored = store.get(where={"doc_id": doc_id}, include=[])["ids"]
+            for id_batch in batched([chunk_id for chunk_id in stored if chunk_id not in keep], store.max_batch_size):
+                store.delete(ids=id_batch)
+                sparse.delete(id_batch)
+                stats.deleted += len(id_batch)
+
+        completed = False
+        try:
+            for shard in shards:
+                name = os.path.splitext(os.path.basename(shard))[0]
+                source = f"{dataset}/{name}"
+                doc_id = document_id(source)
+                sources.append(source)
+                rows = (
+                    Document(page_content=text, metadata={"source": source, "row": row, "doc_id": doc_id})
+                    for row, text in enumerate(read_shard_texts(shard, text_column))
+                )
+                chunks, ids, row_counts = [], [], {}
+                for chunk in text_splitter.iter_documents(rows):
+                    row = chunk.metadata["row"]
+                    ids.append(f"{doc_id}-{row}-{row_counts.get(row, 0)}")
+                    row_counts[row] = row_counts.get(row, 0) + 1
+                    chunks.append(chunk)
+                written = stats.chunks
+                index_chunks(store, chunks, ids=ids, write_batch_size=store.max_batch_size, upsert=True, report=False, sparse_index=sparse, stats=stats)
+                # Drop chunks of rows that were removed or now split into fewer pieces
+                deleted = stats.deleted
+                delete_document(doc_id, keep=set(ids))
+                print(f"Indexed {stats.chunks - written} chunks from {shard}; deleted {stats.deleted - deleted} stale.")
+
+            for source in sorted(previous - set(sources)):
+                deleted = stats.deleted
+                delete_document(document_id(source))
+                print(f"Deleted {stats.deleted - deleted} chunks of {source}, which is no longer in {shard_dir}.")
+            completed = True
+        finally:
+            if stats.changed:
+                store.persist()
+                sparse.persist()
+                bump_index_generation(CHROMA_PATH)
+            # After a failure keep the old shards listed too, so the next run still cleans them up
+            manifest[dataset] = sorted(set(sources) if completed else previous | set(sources))
+            save_manifest(manifest)
+    print(f"Indexed {stats.chunks} chunks from {len(shards)} shards; deleted {stats.deleted} stale.")
+
 
-# Extract the top 2000 entries
-top_2000 = df.head(2000)
+def load_manifest() -> dict:
+    """Shard sources indexed so far, per dataset directory name."""
+    try:
+        with open(os.path.join(CHROMA_PATH, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-# Save to a new file
-top_2000.to_csv("top_2000_entries.csv", index=False)
 
-# Display the first few rows
-print(top_2000.head())
+def save_manifest(manifest: dict):
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    path = os.path.join(CHROMA_PATH, MANIFEST_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
 
-# Calculate the number of characters in the dataset
-num_characters = top_2000.astype(str).applymap(len).sum().sum()
 
-print(f"Total number of characters in 'top_2000_entries.csv': {num_characters}")
+if __name__ == "__main__":
+    main()
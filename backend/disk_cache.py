@@ -0,0 +1,128 @@
+# disk_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Small JSON-on-disk key/value cache with a TTL and a total size cap.
+
+    Each entry is one file named after the SHA-256 of its key. Reads refresh
+    the file's mtime, and when the cache grows past `max_bytes` the entries
+    with the oldest mtime are removed first.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float = None, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json"))
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str):
+        """Return the value stored under `key`, or None if absent or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        expires = entry.get("expires")
+        if expires is not None and expires < time.time():
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry["value"]
+
+    def set(self, key: str, value, ttl_seconds: float = None):
+        """Store a JSON-serializable `value` under `key`."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = {
+            "key": key,
+            "expires": time.time() + ttl if ttl else None,
+            "value": value,
+        }
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(temp_path)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._size += size - previous
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._prune()
+
+    def delete(self, key: str):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                self._remove(entry.path)
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        # Trim to 90% of the cap so the next few writes do not prune again.
+        target = int(self.max_bytes * 0.9)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        with self._lock:
+            self._size = total
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
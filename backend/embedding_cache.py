@@ -0,0 +1,179 @@
+# embedding_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+import numpy as np
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+# Maximum number of cached vectors; 0 disables the cache.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "100000"))
+
+KEY_BYTES = 16
+# File inside the cache directory that processes sharing the cache lock around slot reads and writes.
+LOCK_FILE = "cache.lock"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text the way it should be compared for cache lookups."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Digest of (model name, normalized text) used to address a cached vector."""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache with least-recently-used eviction.
+
+    Vectors live in a memory-mapped float32 matrix with one row per slot. Two
+    companion memory-mapped arrays hold each slot's key digest and last-use
+    tick, so the hash index and LRU order are rebuilt from disk on open and
+    every update is a handful of row writes rather than an index rewrite.
+
+    Several processes (e.g. server workers) may share one directory. The
+    shared arrays are then the source of truth: slots are allocated from
+    them under an exclusive file lock, reads hold a shared lock, and a slot
+    is only used when its stored key matches. Each process's key-to-slot
+    map is just a hint, so entries written by other processes since it
+    opened the cache are misses.
+    """
+
+    def __init__(self, directory: str, dimension: int, capacity: int = EMBEDDING_CACHE_SIZE):
+        self.directory = directory
+        self.dimension = dimension
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        meta = {"dimension": dimension, "capacity": capacity}
+        with self._file_lock(exclusive=True):
+            mode = "r+"
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    if json.load(f) != meta:
+                        mode = "w+"
+            except (OSError, ValueError):
+                mode = "w+"
+            if mode == "w+":
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+
+            self._vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode=mode, shape=(capacity, dimension))
+            self._keys = np.memmap(os.path.join(directory, "keys.bin"), dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES))
+            self._last_used = np.memmap(os.path.join(directory, "last_used.i64"), dtype=np.int64, mode=mode, shape=(capacity,))
+
+            occupied = np.flatnonzero(self._last_used)
+            self._slots = {self._keys[slot].tobytes(): int(slot) for slot in occupied}
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """
+        Lock the cache against other processes; a no-op where fcntl is unavailable.
+
+        The lock file is opened on every call: a descriptor inherited across
+        fork would share its lock with the parent and exclude nothing.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get_many(self, keys: list[bytes]) -> list:
+        """Return the cached vector for each key, or None where it is missing."""
+        found = []
+        with self._lock, self._file_lock(exclusive=False):
+            for key in keys:
+                slot = self._slots.get(key)
+                vector = None
+                if slot is not None and self._keys[slot].tobytes() == key:
+                    vector = np.array(self._vectors[slot])
+                    # The key is written after the vector, so a match after the copy means the copy is that key's
+                    if self._keys[slot].tobytes() != key or not self._last_used[slot]:
+                        vector = None
+                if vector is None:
+                    if slot is not None:
+                        # Another process sharing these files evicted or reused the slot
+                        del self._slots[key]
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.hits += 1
+                    self._last_used[slot] = time.time_ns()
+                    found.append(vector)
+        return found
+
+    def put_many(self, keys: list[bytes], vectors: np.ndarray):
+        """Store `vectors` under `keys`, evicting the least recently used rows if full."""
+        with self._lock, self._file_lock(exclusive=True):
+            pending = {key: vector for key, vector in zip(keys, vectors) if key not in self._slots}
+            pending = list(pending.items())[-self.capacity:] if self.capacity else []
+            # Free slots are read from the shared arrays, since other processes allocate from them too
+            free = list(np.flatnonzero(self._last_used == 0)[::-1])
+            shortfall = len(pending) - len(free)
+            if shortfall > 0:
+                free.extend(self._evict(shortfall))
+
+            for key, vector in pending:
+                slot = int(free.pop())
+                # Vector first, then key, then tick: readers only trust a slot whose key matches after copying
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._last_used[slot] = time.time_ns()
+                self._slots[key] = slot
+
+    def _evict(self, count: int) -> list[int]:
+        """Free the `count` least recently used slots and return them; the caller holds the exclusive lock."""
+        ticks = np.where(self._last_used > 0, self._last_used, np.iinfo(np.int64).max)
+        victims = np.argpartition(ticks, count - 1)[:count] if count < len(ticks) else np.arange(len(ticks))
+        freed = []
+        for slot in victims:
+            slot = int(slot)
+            if not self._last_used[slot]:
+                continue
+            key = self._keys[slot].tobytes()
+            if self._slots.get(key) == slot:
+                del self._slots[key]
+            self._last_used[slot] = 0
+            self._keys[slot] = 0
+            freed.append(slot)
+            self.evictions += 1
+        return freed
+
+    def flush(self):
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._last_used.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": int(np.count_nonzero(self._last_used)),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
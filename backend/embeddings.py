@@ -0,0 +1,129 @@
+# embeddings.py
+import os
+import threading
+
+import numpy as np
+
+from embedding_cache import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_SIZE, EmbeddingCache, cache_key
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "paraphrase-MiniLM-L6-v2")
+
+
+class EmbeddingService:
+    """
+    Process-wide holder for the SentenceTransformer used by ingestion and retrieval.
+
+    The model is loaded on first use (or by `warmup`) and shared by every caller,
+    so a request only pays for the forward pass. Texts already seen are served
+    from the on-disk EmbeddingCache without touching the model.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, cache_size: int = EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._cache = None
+        self._load_lock = threading.Lock()
+        # Fast tokenizers are not safe to call from several threads at once.
+        self._encode_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                    print(f"Loaded embedding model '{self.model_name}'.")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def cache(self):
+        """The EmbeddingCache for this model, or None when caching is disabled."""
+        if self._cache is None and self.cache_size > 0:
+            dimension = self.dimension
+            with self._load_lock:
+                if self._cache is None:
+                    directory = os.path.join(EMBEDDING_CACHE_DIR, self.model_name.replace("/", "__"))
+                    self._cache = EmbeddingCache(directory, dimension, self.cache_size)
+        return self._cache
+
+    def warmup(self):
+        """Load the model and run one dummy forward pass."""
+        self.encode("warmup")
+
+    def warmup_async(self) -> threading.Thread:
+        """Warm the model up on a daemon thread so startup is not blocked."""
+        def _run():
+            try:
+                self.warmup()
+            except Exception as e:
+                print(f"Embedding warmup failed: {str(e)}")
+
+        thread = threading.Thread(target=_run, name="embedding-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embed a single string and return a 1-D float32 vector."""
+        return self.encode_batch([text])[0]
+
+    def encode_batch(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        """Embed a list of strings and return a (len(texts), dim) float32 matrix."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        cache = self.cache
+        if cache is None:
+            return self._encode(texts, batch_size)
+
+        keys = [cache_key(self.model_name, text) for text in texts]
+        cached = cache.get_many(keys)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        # Encode each missing text once, even if it repeats within the batch.
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, cached)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                embeddings[i] = vector
+        if missing:
+            positions = list(missing.values())
+            fresh = self._encode([texts[group[0]] for group in positions], batch_size)
+            cache.put_many(list(missing.keys()), fresh)
+            for group, vector in zip(positions, fresh):
+                embeddings[group] = vector
+        return embeddings
+
+    def _encode(self, texts: list[str], batch_size: int) -> np.ndarray:
+        model = self.model
+        with self._encode_lock:
+            embeddings = model.encode(
+                list(texts),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared EmbeddingService for this process."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
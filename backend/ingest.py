@@ -0,0 +1,281 @@
+# ingest.py
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from embeddings import get_embedding_service
+from metrics import span
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# Number of chunks handed to model.encode at once.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Number of chunks per collection.add/upsert call; capped by the Chroma client's limit.
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "1024"))
+# File inside the index directory whose content changes on every ingest that modifies it.
+GENERATION_FILE = "index_generation"
+# File inside the index directory that writers lock while they reload, update and persist the index.
+LOCK_FILE = "index.lock"
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    skipped: int = 0
+    updated: int = 0
+    deleted: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.chunks or self.updated or self.deleted)
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.total_seconds if self.total_seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        report = (
+            f"Indexed {self.chunks} chunks in {self.total_seconds:.2f}s "
+            f"({self.chunks_per_sec:.1f} chunks/sec; "
+            f"embed {self.embed_seconds:.2f}s, write {self.write_seconds:.2f}s)"
+        )
+        if self.skipped or self.updated or self.deleted:
+            report += f"; skipped {self.skipped} unchanged, updated {self.updated}, deleted {self.deleted} stale"
+        return report
+
+
+def batched(items: list, size: int):
+    """Yield consecutive slices of `items` holding at most `size` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def max_write_batch_size(client, requested: int = WRITE_BATCH_SIZE) -> int:
+    """Clamp `requested` to the largest batch the Chroma client accepts."""
+    if hasattr(client, "get_max_batch_size"):
+        limit = client.get_max_batch_size()
+    else:
+        limit = getattr(client, "max_batch_size", requested)
+    return max(1, min(requested, limit))
+
+
+def index_chunks(
+    collection,
+    chunks: list[Document],
+    ids: list[str] = None,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    upsert: bool = False,
+    report: bool = True,
+    progress=None,
+    sparse_index=None,
+    stats: IngestStats = None,
+) -> IngestStats:
+    """
+    Embed `chunks` in batches and write them to `collection` with bulk calls.
+
+    Args:
+        collection: Chroma collection (or anything exposing add/upsert).
+        chunks (list[Document]): Chunks to index.
+        ids (list[str]): One ID per chunk; defaults to positional IDs.
+        embed_batch_size (int): Chunks per model.encode call.
+        write_batch_size (int): Chunks per collection.add/upsert call.
+        upsert (bool): Use collection.upsert instead of collection.add.
+        report (bool): Print the throughput report when done.
+        progress (callable): Called as progress(done, total) after each write batch.
+        sparse_index (BM25Index): Also index each batch here as soon as it is written.
+        stats (IngestStats): Counters to update as batches are written, so a
+            caller can tell what reached the store if a later batch fails.
+
+    Returns:
+        IngestStats: Timings and throughput for the run.
+    """
+    if ids is None:
+        ids = [str(i) for i in range(len(chunks))]
+    if len(ids) != len(chunks):
+        raise ValueError("ids and chunks must have the same length.")
+
+    embedder = get_embedding_service()
+    write = collection.upsert if upsert else collection.add
+    if stats is None:
+        stats = IngestStats()
+    started = time.perf_counter()
+
+    for chunk_batch, id_batch in zip(batched(chunks, write_batch_size), batched(ids, write_batch_size)):
+        texts = [doc.page_content for doc in chunk_batch]
+
+        t0 = time.perf_counter()
+        with span("embed", chunks=len(texts)):
+            embeddings = embedder.encode_batch(texts, batch_size=embed_batch_size)
+        t1 = time.perf_counter()
+        with span("vector_store.write", chunks=len(texts)):
+            write(
+                ids=id_batch,
+                embeddings=embeddings.tolist(),
+                metadatas=[doc.metadata for doc in chunk_batch],
+                documents=texts,
+            )
+        t2 = time.perf_counter()
+        if sparse_index is not None:
+            sparse_index.add(id_batch, texts)
+
+        stats.chunks += len(chunk_batch)
+        stats.embed_seconds += t1 - t0
+        stats.write_seconds += t2 - t1
+        if progress is not None:
+            progress(stats.chunks, len(chunks))
+
+    stats.total_seconds = time.perf_counter() - started
+    if report:
+        print(stats)
+    return stats
+
+
+def document_id(source: str) -> str:
+    """Stable ID for a source document, derived from its source name."""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def assign_chunk_ids(chunks: list[Document]) -> list[str]:
+    """
+    Derive content-addressed IDs for `chunks` and stamp `doc_id` into their metadata.
+
+    An ID is the source document's ID plus a hash of the chunk text, so an
+    unchanged chunk keeps its ID across re-ingests no matter where it moves.
+    Repeated text within one document gets an occurrence suffix.
+    """
+    ids = []
+    seen = {}
+    for doc in chunks:
+        doc_id = document_id(str(doc.metadata.get("source", "")))
+        digest = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+        key = (doc_id, digest)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+
+        doc.metadata["doc_id"] = doc_id
+        ids.append(f"{doc_id}-{digest}-{occurrence}")
+    return ids
+
+
+def sync_chunks(
+    collection,
+    chunks: list[Document],
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    progress=None,
+    sparse_index=None,
+    stats: IngestStats = None,
+) -> IngestStats:
+    """
+    Bring `collection` in line with `chunks`, touching only what changed.
+
+    Chunks whose ID is already stored are not re-embedded (their metadata is
+    refreshed if it moved), new chunks are embedded and upserted, and stored
+    chunks of the same source documents that no longer appear are deleted.
+    When `sparse_index` (a BM25Index) is given, the same additions and
+    deletions are applied to it batch by batch, so it matches the store even
+    if the sync is cancelled or fails part way. `stats` is updated as each
+    batch lands; callers persist and bump the index generation whenever
+    `stats.changed`, including after a failure.
+    """
+    started = time.perf_counter()
+    if stats is None:
+        stats = IngestStats()
+    ids = assign_chunk_ids(chunks)
+
+    existing = {}
+    for doc_id in dict.fromkeys(doc.metadata["doc_id"] for doc in chunks):
+        stored = collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        existing.update(zip(stored["ids"], stored["metadatas"]))
+
+    new_ids, new_chunks = [], []
+    changed_ids, changed_metadatas = [], []
+    for chunk_id, doc in zip(ids, chunks):
+        if chunk_id not in existing:
+            new_ids.append(chunk_id)
+            new_chunks.append(doc)
+        elif existing[chunk_id] != doc.metadata:
+            changed_ids.append(chunk_id)
+            changed_metadatas.append(doc.metadata)
+
+    stats.skipped = len(chunks) - len(new_chunks)
+    stale_ids = list(existing.keys() - set(ids))
+    for id_batch in batched(stale_ids, write_batch_size):
+        collection.delete(ids=id_batch)
+        if sparse_index is not None:
+            sparse_index.delete(id_batch)
+        stats.deleted += len(id_batch)
+    for id_batch, metadata_batch in zip(batched(changed_ids, write_batch_size), batched(changed_metadatas, write_batch_size)):
+        collection.update(ids=id_batch, metadatas=metadata_batch)
+        stats.updated += len(id_batch)
+
+    index_chunks(
+        collection,
+        new_chunks,
+        ids=new_ids,
+        embed_batch_size=embed_batch_size,
+        write_batch_size=write_batch_size,
+        upsert=True,
+        report=False,
+        progress=progress,
+        sparse_index=sparse_index,
+        stats=stats,
+    )
+    stats.total_seconds = time.perf_counter() - started
+    print(stats)
+    return stats
+
+
+def index_generation(index_path: str):
+    """Current generation token of the index at `index_path`, or None if never bumped."""
+    try:
+        with open(os.path.join(index_path, GENERATION_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def bump_index_generation(index_path: str) -> str:
+    """Record that the index changed, so caches derived from it can invalidate themselves."""
+    os.makedirs(index_path, exist_ok=True)
+    generation = str(time.time_ns())
+    path = os.path.join(index_path, GENERATION_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(temp_path, path)
+    return generation
+
+
+@contextmanager
+def index_write_lock(index_path: str):
+    """
+    Hold an exclusive lock on the index at `index_path` across processes.
+
+    Each worker of a multi-process server keeps its own copy of an in-memory
+    index. Holding this lock from reloading the index to bumping its
+    generation stops two workers' ingests from overwriting each other. Where
+    fcntl is unavailable (Windows) it does nothing.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(index_path, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
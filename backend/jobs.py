@@ -0,0 +1,364 @@
+# jobs.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Submissions are refused once this many jobs are waiting.
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "32"))
+# A running job whose heartbeat is older than this is assumed orphaned (e.g. by a
+# crash or restart) and is picked up again.
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+# A running job's heartbeat is refreshed this often, whatever its handler is doing.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_STALE_SECONDS / 10)))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLost(JobCancelled):
+    """Raised in a handler whose job was claimed by another worker after being presumed orphaned."""
+
+
+class JobContext:
+    """Handle passed to a job handler for reporting stage progress and honouring cancellation."""
+
+    def __init__(self, queue, job: dict):
+        self.queue = queue
+        self.id = job["id"]
+        self.owner = job["owner"]
+        self.payload = job["payload"]
+        self.stages = job["stages"]
+
+    def _stage(self, name: str) -> dict:
+        for stage in self.stages:
+            if stage["name"] == name:
+                return stage
+        stage = {"name": name, "status": "pending", "progress": 0.0, "seconds": None}
+        self.stages.append(stage)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mark `name` running for the duration of the block, then done with its duration."""
+        self.check_cancelled()
+        stage = self._stage(name)
+        stage.update(status="running", progress=0.0)
+        self.queue._save_stages(self.id, self.owner, self.stages)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            stage["status"] = "failed"
+            self.queue._save_stages(self.id, self.owner, self.stages)
+            raise
+        stage.update(status="done", progress=1.0, seconds=round(time.perf_counter() - started, 3))
+        self.queue._save_stages(self.id, self.owner, self.stages)
+
+    def progress(self, done: int, total: int):
+        """Report progress within the running stage; raises JobCancelled if cancellation was requested."""
+        for stage in self.stages:
+            if stage["status"] == "running":
+                stage["progress"] = round(done / total, 4) if total else 1.0
+        self.queue._save_stages(self.id, self.owner, self.stages)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        cancel_requested, owner = self.queue._cancel_state(self.id)
+        if owner != self.owner:
+            raise JobLost()
+        if cancel_requested:
+            raise JobCancelled()
+
+
+class JobQueue:
+    """
+    Persistent background job queue backed by SQLite.
+
+    Jobs are rows in `db_path`, so queued work survives restarts and several
+    processes can share one queue: worker threads claim a job with an atomic
+    UPDATE. Each claim records a unique owner on the row and only the owner
+    may update it, so a job that is claimed again after being presumed
+    orphaned cannot be finished twice. `handlers` maps a job kind to a callable taking a JobContext and
+    returning a JSON-serializable result. `cleanup` optionally maps a kind to a
+    callable taking the job's payload, run once the job is finished however it
+    ended (including cancelled while queued or given up without running), to
+    release what the submitter set aside for it.
+    """
+
+    def __init__(self, handlers: dict, db_path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED, cleanup: dict = None):
+        self.handlers = handlers
+        self.cleanup = cleanup or {}
+        self.db_path = db_path
+        self.workers = workers
+        self.max_queued = max_queued
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._slot_files = []
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        for field in ("payload", "stages", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def start(self):
+        """Start worker threads in this process (again after a fork); safe to call repeatedly."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._start_threads(range(self.workers))
+
+    def start_shared(self) -> int:
+        """
+        Start this process's share of `workers` when several server processes run the queue.
+
+        Each worker slot is a lock file next to the database, held for life
+        by at most one process, so the server as a whole runs at most
+        `workers` jobs at once however many processes it forks. A slot whose
+        holder exits is taken by the next process to call this (e.g. the
+        worker that replaces it). Returns the number of slots taken here,
+        possibly 0; `submit` will not start more threads in this process.
+        Without fcntl (Windows) it falls back to `start`.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            self.start()
+            return self.workers
+        with self._lock:
+            if self._pid == os.getpid():
+                return len(self._slot_files)
+            self._pid = os.getpid()
+            # Locks inherited across fork belong to the parent's open files; never reuse them
+            self._slot_files = []
+            slots = []
+            for i in range(self.workers):
+                f = open(f"{self.db_path}.worker{i}.lock", "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    continue
+                self._slot_files.append(f)
+                slots.append(i)
+            self._start_threads(slots)
+            return len(slots)
+
+    def _start_threads(self, slots):
+        for i in slots:
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, kind: str, payload: dict, stages: list[str]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.start()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs are already queued.")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, stages, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    json.dumps(payload),
+                    json.dumps([{"name": name, "status": "pending", "progress": 0.0, "seconds": None} for name in stages]),
+                    time.time(),
+                ),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: str):
+        """Cancel a queued job immediately, or ask a running one to stop at its next checkpoint."""
+        with self._connect() as conn:
+            dequeued = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            ).rowcount
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        job = self.get(job_id)
+        if dequeued:
+            self._cleanup(job)
+        return job
+
+    def wait(self, job_id: str, timeout: float = None, poll_seconds: float = 0.5):
+        """Block until the job finishes (or `timeout` passes) and return it."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_seconds)
+
+    def _claim(self):
+        now = time.time()
+        owner = f"{os.getpid()}/{threading.current_thread().name}/{uuid.uuid4().hex[:8]}"
+        with self._connect() as conn:
+            candidates = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) ORDER BY created_at LIMIT 5",
+                (now - JOB_STALE_SECONDS,),
+            ).fetchall()
+            for candidate in candidates:
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat = ?, owner = ?, attempts = attempts + 1 "
+                    "WHERE id = ? AND (status = 'queued' OR (status = 'running' AND heartbeat < ?))",
+                    (now, now, owner, candidate["id"], now - JOB_STALE_SECONDS),
+                ).rowcount
+                if claimed:
+                    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (candidate["id"],)).fetchone()
+                    return self._row_to_job(row)
+        return None
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue error: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        if job["attempts"] > JOB_MAX_ATTEMPTS:
+            self._finish(job, "failed", error="Gave up after repeated interruptions.")
+            return
+        context = JobContext(self, job)
+        stop = threading.Event()
+        beat = threading.Thread(target=self._beat, args=(job["id"], job["owner"], stop), name=f"job-heartbeat-{job['id'][:8]}", daemon=True)
+        beat.start()
+        try:
+            result = self.handlers[job["kind"]](context)
+        except JobLost:
+            print(f"Job {job['id']} was claimed by another worker; abandoning this run.")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            print(f"Job {job['id']} failed: {str(e)}")
+            self._finish(job, "failed", error=str(e))
+        else:
+            self._finish(job, "succeeded", result=result)
+        finally:
+            stop.set()
+            beat.join()
+
+    def _beat(self, job_id: str, owner: str, stop: threading.Event):
+        """Keep a running job's heartbeat fresh until `stop` is set, so long stages are not taken for orphans."""
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with self._connect() as conn:
+                    alive = conn.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                        (time.time(), job_id, owner),
+                    ).rowcount
+            except sqlite3.Error as e:
+                print(f"Job queue error: {str(e)}")
+                continue
+            if not alive:
+                return
+
+    def _finish(self, job: dict, status: str, result=None, error: str = None):
+        """Record how the job ended, if this run still owns it, and then clean up after it."""
+        with self._connect() as conn:
+            finished = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job["id"], job["owner"]),
+            ).rowcount
+        if not finished:
+            print(f"Job {job['id']} was claimed by another worker; discarding this run's outcome ({status}).")
+            return
+        self._cleanup(job)
+
+    def _cleanup(self, job: dict):
+        cleanup = self.cleanup.get(job["kind"])
+        if cleanup is None:
+            return
+        try:
+            cleanup(job["payload"])
+        except Exception as e:
+            print(f"Job {job['id']} cleanup failed: {str(e)}")
+
+    def _save_stages(self, job_id: str, owner: str, stages: list[dict]):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stages = ?, heartbeat = ? WHERE id = ? AND owner = ?",
+                (json.dumps(stages), time.time(), job_id, owner),
+            )
+
+    def _cancel_state(self, job_id: str) -> tuple:
+        """(cancel requested, current owner) of a job."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return (bool(row[0]), row[1]) if row else (False, None)
@@ -22,3 +22,54 @@ def calculate_levenshtein_accuracy(predicted: str, actual: str) -> float:
     accuracy = ((max_length - distance) / max_length) * 100 if max_length > 0 else 0
 
     return accuracy
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def ocr_error_rates(predicted: list[str], actual: list[str], workers: int = -1) -> dict:
+    """
+    Bulk OCR quality metrics for aligned (predicted, actual) text pairs.
+
+    Distances for all pairs are computed in one RapidFuzz `cpdist` call per
+    metric, which runs in native code across `workers` threads (-1 = all
+    cores). Whitespace is normalized before scoring.
+
+    Args:
+    - predicted (list[str]): OCR outputs.
+    - actual (list[str]): Ground-truth texts, aligned with `predicted`.
+    - workers (int): Threads used by RapidFuzz.
+
+    Returns:
+    - dict: NumPy arrays "cer" (character error rate), "wer" (word error
+      rate) and "accuracy" (calculate_levenshtein_accuracy's percentage), one
+      value per pair.
+    """
+    import numpy as np
+    from rapidfuzz import process
+    from rapidfuzz.distance import Levenshtein as RFLevenshtein
+
+    if len(predicted) != len(actual):
+        raise ValueError("predicted and actual must have the same length.")
+    predicted = [_normalize(text) for text in predicted]
+    actual = [_normalize(text) for text in actual]
+    if not predicted:
+        empty = np.empty(0, dtype=np.float64)
+        return {"cer": empty, "wer": empty, "accuracy": empty}
+
+    char_distances = process.cpdist(predicted, actual, scorer=RFLevenshtein.distance, workers=workers).astype(np.float64)
+    predicted_words = [text.split() for text in predicted]
+    actual_words = [text.split() for text in actual]
+    word_distances = process.cpdist(predicted_words, actual_words, scorer=RFLevenshtein.distance, workers=workers).astype(np.float64)
+
+    predicted_chars = np.array([len(text) for text in predicted], dtype=np.float64)
+    actual_chars = np.array([len(text) for text in actual], dtype=np.float64)
+    actual_word_counts = np.array([len(words) for words in actual_words], dtype=np.float64)
+    max_chars = np.maximum(predicted_chars, actual_chars)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cer = np.where(actual_chars > 0, char_distances / actual_chars, (predicted_chars > 0).astype(np.float64))
+        wer = np.where(actual_word_counts > 0, word_distances / actual_word_counts, (char_distances > 0).astype(np.float64))
+        accuracy = np.where(max_chars > 0, (max_chars - char_distances) / max_chars * 100, 0.0)
+    return {"cer": cer, "wer": wer, "accuracy": accuracy}
@@ -0,0 +1,123 @@
+# llm_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from disk_cache import DiskCache
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+# Set to a directory to keep responses across restarts and share them between workers.
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+LLM_CACHE_DISK_TTL = float(os.getenv("LLM_CACHE_DISK_TTL", 7 * 24 * 3600))
+LLM_CACHE_DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", 128 * 1024 * 1024))
+
+
+def response_key(backend: str, model: str, temperature, prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{backend}:{model}:{temperature}:{digest}"
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM completions keyed by backend, model, temperature and prompt hash.
+
+    The first tier is an in-process LRU with a TTL; the optional second tier
+    is a DiskCache, so identical prompts are answered without a remote call.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_SIZE,
+        ttl_seconds: float = LLM_CACHE_TTL,
+        disk_dir: str = LLM_CACHE_DIR,
+        disk_ttl_seconds: float = LLM_CACHE_DISK_TTL,
+        disk_max_bytes: int = LLM_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = DiskCache(disk_dir, disk_ttl_seconds, disk_max_bytes) if disk_dir else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def _remember(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_call(self, backend: str, model: str, temperature, prompt: str, call, bypass: bool = False) -> str:
+        """
+        Return the cached response for this prompt, or `call()` it and cache the result.
+
+        With `bypass=True` the cache is neither read nor written.
+        """
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+            return call()
+
+        key = response_key(backend, model, temperature, prompt)
+        value = self.get(key)
+        if value is None:
+            value = call()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+LLM_CACHE = LLMResponseCache()
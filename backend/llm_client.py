@@ -0,0 +1,221 @@
+# llm_client.py
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_cache import LLM_CACHE
+from metrics import span
+
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-70b-8192")  # or "mixtral-8x7b-32768"
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Upper bound on concurrent completions, which is also the keep-alive pool size.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+def groq_headers(api_key: str) -> dict:
+    """Request headers for Groq; raises LLMError when no API key is configured."""
+    if not api_key:
+        raise LLMError("GROQ_API_KEY is not set; set it in the environment or .env to use the Groq backend.")
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+class LLMClient:
+    """
+    Shared client for the Groq and Ollama chat backends.
+
+    Both backends go through one pooled `requests.Session` (HTTP keep-alive),
+    with connect/read timeouts and jittered exponential backoff on connection
+    errors, timeouts, 429 and 5xx. `complete` optionally goes through the
+    LLM response cache; `acomplete`/`agather` expose it to asyncio code on a
+    bounded thread pool and `complete_many` fans a batch out over that pool
+    for synchronous callers.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        read_timeout: float = LLM_READ_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)].
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    def post(self, url: str, payload: dict, headers: dict = None, stream: bool = False) -> requests.Response:
+        """POST JSON with retries; returns the first non-retryable response."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"LLM request to {url} failed: {str(e)}") from e
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response
+
+    def chat_groq(self, prompt: str, api_key: str, model: str = GROQ_MODEL, temperature: float = 0.7) -> str:
+        headers = groq_headers(api_key)
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature
+        }
+        with span("llm.groq", model=model):
+            result = self.post(GROQ_API_URL, payload, headers).json()
+        return result["choices"][0]["message"]["content"]
+
+    def chat_ollama(self, prompt: str, model: str = OLLAMA_MODEL) -> str:
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False
+        }
+        with span("llm.ollama", model=model):
+            result = self.post(f"{OLLAMA_HOST}/api/chat", payload).json()
+        return result["message"]["content"]
+
+    def stream_groq(self, prompt: str, api_key: str, model: str = GROQ_MODEL, temperature: float = 0.7):
+        """Yield completion tokens from Groq's server-sent event stream."""
+        headers = groq_headers(api_key)
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "stream": True
+        }
+        with span("llm.groq.stream", model=model), self.post(GROQ_API_URL, payload, headers, stream=True) as response:
+            for raw in response.iter_lines():
+                line = raw.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    def stream_ollama(self, prompt: str, model: str = OLLAMA_MODEL):
+        """Yield completion tokens from Ollama's newline-delimited JSON stream."""
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True
+        }
+        with span("llm.ollama.stream", model=model), self.post(f"{OLLAMA_HOST}/api/chat", payload, stream=True) as response:
+            for raw in response.iter_lines():
+                if not raw:
+                    continue
+                message = json.loads(raw)
+                if message.get("error"):
+                    raise LLMError(message["error"])
+                content = message.get("message", {}).get("content")
+                if content:
+                    yield content
+                if message.get("done"):
+                    break
+
+    def stream(self, prompt: str, backend: str = "groq", **kwargs):
+        """Yield completion tokens from `backend` ("groq" or "ollama") as they arrive."""
+        if backend == "groq":
+            return self.stream_groq(prompt, **kwargs)
+        if backend == "ollama":
+            return self.stream_ollama(prompt, **kwargs)
+        raise ValueError(f"Unknown LLM backend: {backend}")
+
+    def complete(self, prompt: str, backend: str = "groq", use_cache: bool = False, **kwargs) -> str:
+        """
+        Run one completion on `backend` ("groq" or "ollama").
+
+        With `use_cache` the response is served from, or stored in, LLM_CACHE
+        under the backend, model, temperature and prompt.
+        """
+        if backend == "groq":
+            call = partial(self.chat_groq, prompt, **kwargs)
+            model, temperature = kwargs.get("model", GROQ_MODEL), kwargs.get("temperature", 0.7)
+        elif backend == "ollama":
+            call = partial(self.chat_ollama, prompt, **kwargs)
+            model, temperature = kwargs.get("model", OLLAMA_MODEL), None
+        else:
+            raise ValueError(f"Unknown LLM backend: {backend}")
+        return LLM_CACHE.get_or_call(backend, model, temperature, prompt, call, bypass=not use_cache)
+
+    async def acomplete(self, prompt: str, backend: str = "groq", use_cache: bool = False, **kwargs) -> str:
+        """`complete` on the client's bounded pool, awaited without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self.complete(prompt, backend, use_cache, **kwargs))
+
+    async def agather(self, prompts: list[str], backend: str = "groq", use_cache: bool = False, return_exceptions: bool = False, **kwargs) -> list:
+        """Run completions for `prompts` concurrently, bounded by the client's pool."""
+        return await asyncio.gather(
+            *(self.acomplete(prompt, backend, use_cache, **kwargs) for prompt in prompts),
+            return_exceptions=return_exceptions,
+        )
+
+    def complete_many(self, prompts: list[str], backend: str = "groq", use_cache: bool = False, return_exceptions: bool = False, **kwargs) -> list:
+        """
+        Blocking wrapper around `agather` for synchronous (Flask) callers.
+
+        With `return_exceptions` a failed completion is returned in its place
+        instead of failing the whole batch.
+        """
+        return asyncio.run(self.agather(prompts, backend, use_cache, return_exceptions, **kwargs))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLMClient for this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
@@ -0,0 +1,376 @@
+# metrics.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets (+Inf is implicit).
+LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.getenv("METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120").split(",")
+)
+# Spans are exported over OTLP only when an endpoint is configured.
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "rag-backend")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with one value (or histogram) per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label pairs, value) for every series of this metric."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", list(zip(self.labelnames, key)), value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram, as Prometheus expects it."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield "_bucket", labels + [("le", _format_value(bound))], cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class Registry:
+    """
+    The metrics of this process, rendered in the Prometheus text format.
+
+    Besides its own metrics, the registry renders the hit/miss counts of any
+    cache registered with `register_cache`, read from the cache's `stats()`
+    at scrape time. Under a multi-worker server each worker has its own
+    registry, so a scrape sees the worker that answered it.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_cache(self, name: str, stats_fn):
+        """Export hits, misses and hit ratio of a cache whose `stats_fn()` returns its stats dict (or None)."""
+        with self._lock:
+            self._caches[name] = stats_fn
+
+    def _cache_metrics(self) -> list[Metric]:
+        hits = Counter("rag_cache_hits_total", "Cache lookups answered from the cache.", ("cache",))
+        misses = Counter("rag_cache_misses_total", "Cache lookups that missed.", ("cache",))
+        ratio = Gauge("rag_cache_hit_ratio", "Hits over lookups since the process started.", ("cache",))
+        entries = Gauge("rag_cache_entries", "Entries currently held by the cache.", ("cache",))
+        with self._lock:
+            caches = list(self._caches.items())
+        for name, stats_fn in caches:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                print(f"Could not read {name} cache stats: {str(e)}")
+                continue
+            if not stats:
+                continue
+            hits.inc(stats.get("hits", stats.get("memory_hits", 0) + stats.get("disk_hits", 0)), cache=name)
+            misses.inc(stats.get("misses", 0), cache=name)
+            ratio.set(stats.get("hit_ratio", 0.0), cache=name)
+            if "entries" in stats:
+                entries.set(stats["entries"], cache=name)
+        return [hits, misses, ratio, entries]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics + self._cache_metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("rag_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("rag_stage_errors_total", "Pipeline stages that raised an exception.", ("stage",))
+STAGES_IN_FLIGHT = REGISTRY.gauge("rag_stages_in_flight", "Pipeline stages currently running.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("rag_request_seconds", "HTTP request latency, until the response body is sent.", ("route", "method", "status"))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge("rag_requests_in_flight", "HTTP requests currently being served.", ("route",))
+PAGES_EXTRACTED = REGISTRY.counter("rag_pages_extracted_total", "PDF pages read, by the path that produced their text.", ("extraction",))
+CHUNKS_SPLIT = REGISTRY.counter("rag_chunks_split_total", "Chunks produced by the text splitter during ingestion.")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_tracing_configured = False
+
+
+def get_tracer():
+    """The OpenTelemetry tracer, or None when opentelemetry-api is not installed."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    from opentelemetry import trace
+                except ImportError:
+                    _tracer = False
+                else:
+                    _tracer = trace.get_tracer(OTEL_SERVICE_NAME)
+    return _tracer or None
+
+
+def setup_tracing() -> bool:
+    """
+    Export spans over OTLP/gRPC when OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+    The exporter runs a background thread, so call this in every serving
+    process (after fork). Without an endpoint, or without the OpenTelemetry
+    SDK, spans go to the API's no-op tracer.
+
+    Returns:
+        bool: Whether spans are being exported.
+    """
+    global _tracing_configured
+    if _tracing_configured or not OTEL_EXPORTER_OTLP_ENDPOINT:
+        return _tracing_configured
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        print(f"OpenTelemetry tracing disabled: {str(e)}")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=OTEL_EXPORTER_OTLP_ENDPOINT)))
+    trace.set_tracer_provider(provider)
+    _tracing_configured = True
+    print(f"Exporting OpenTelemetry spans to {OTEL_EXPORTER_OTLP_ENDPOINT}.")
+    return True
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Time one pipeline stage.
+
+    The duration goes to the rag_stage_seconds histogram, the stage is counted
+    in rag_stages_in_flight while it runs, and exceptions are counted in
+    rag_stage_errors_total. With OpenTelemetry installed the stage is also a
+    trace span carrying `attributes`.
+    """
+    tracer = get_tracer()
+    STAGES_IN_FLIGHT.inc(stage=stage)
+    started = time.perf_counter()
+    try:
+        if tracer is None:
+            yield
+        else:
+            with tracer.start_as_current_span(stage, attributes=attributes):
+                yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        STAGES_IN_FLIGHT.dec(stage=stage)
+
+
+def instrument_flask(app):
+    """
+    Record latency and in-flight counts for every request to `app`, and a server span when tracing.
+
+    Requests are labelled by their URL rule (e.g. /jobs/<job_id>), so the
+    number of series stays bounded. A streamed response is timed until its
+    last event has been sent.
+    """
+    from flask import g, request
+
+    def route() -> str:
+        return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+    @app.before_request
+    def _start_request():
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = route()
+        REQUESTS_IN_FLIGHT.inc(route=g.metrics_route)
+        tracer = get_tracer()
+        if tracer is not None:
+            from opentelemetry import context, trace
+
+            g.metrics_span = tracer.start_span(f"{request.method} {g.metrics_route}", kind=trace.SpanKind.SERVER)
+            g.metrics_token = context.attach(trace.set_span_in_context(g.metrics_span))
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        # Detach here, in the context that attached it; a streamed body may be sent from elsewhere
+        _detach()
+        return response
+
+    def _detach():
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            from opentelemetry import context
+
+            context.detach(token)
+
+    @app.teardown_request
+    def _finish_request(error=None):
+        if "metrics_started" not in g:
+            return
+        status = 500 if error is not None else g.get("metrics_status", 500)
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, route=g.metrics_route, method=request.method, status=status)
+        REQUESTS_IN_FLIGHT.dec(route=g.metrics_route)
+        if "metrics_span" in g:
+            _detach()
+            g.metrics_span.set_attribute("http.status_code", status)
+            g.metrics_span.end()
+
+
+class ASGIRequestMetrics:
+    """
+    ASGI middleware recording the same request metrics and server span as instrument_flask.
+
+    Only requests to `routes` (exact paths) are recorded; anything else, such
+    as a mounted Flask app that records its own, passes straight through. A
+    streamed response is timed until its last body chunk has been sent.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = set(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        route, method = scope["path"], scope["method"]
+        status = 500
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(route=route)
+        server_span = token = None
+        tracer = get_tracer()
+        if tracer is not None:
+            from opentelemetry import context, trace
+
+            server_span = tracer.start_span(f"{method} {route}", kind=trace.SpanKind.SERVER)
+            token = context.attach(trace.set_span_in_context(server_span))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method, status=status)
+            REQUESTS_IN_FLIGHT.dec(route=route)
+            if server_span is not None:
+                from opentelemetry import context
+
+                context.detach(token)
+                server_span.set_attribute("http.status_code", status)
+                server_span.end()
@@ -1,41 +1,214 @@
 # ocr_rag.py
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from disk_cache import DiskCache
+from metrics import span
+
+OCR_SPACE_URL = os.getenv("OCR_SPACE_URL", "https://api.ocr.space/parse/image")
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+OCR_MAX_RETRIES = int(os.getenv("OCR_MAX_RETRIES", "3"))
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "10"))
+OCR_READ_TIMEOUT = float(os.getenv("OCR_READ_TIMEOUT", "120"))
+
+OCR_OPTIONS = {
+    'language': 'eng',
+    'isOverlayRequired': False,
+    'filetype': 'PDF',
+    'detectOrientation': True,
+    'isCreateSearchablePdf': False,
+    'isSearchablePdfHideTextLayer': False,
+    'scale': True,
+    'isTable': False,
+    'OCREngine': 2
+}
+
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "ocr_cache")
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", 7 * 24 * 3600))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_maxsize=OCR_MAX_WORKERS))
+_session.mount("https://", HTTPAdapter(pool_maxsize=OCR_MAX_WORKERS))
+
+
+class OCRError(Exception):
+    pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> DiskCache:
+    """Return this process's OCR result cache, creating its directory on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(OCR_CACHE_DIR, ttl_seconds=OCR_CACHE_TTL, max_bytes=OCR_CACHE_MAX_BYTES)
+    return _cache
+
+
+@dataclass
+class OCRPage:
+    page: int
+    text: str
+    seconds: float = 0.0
+    attempts: int = 0
+    cached: bool = False
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ocr_cache_key(digest: str, page: int, options: dict) -> str:
+    """Cache key for one page: file SHA-256, page number and the OCR options."""
+    return f"{digest}:{page}:{json.dumps(options, sort_keys=True)}"
+
+
+def page_count(pdf_path: str) -> int:
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def split_pdf_pages(pdf_path: str, pages: list[int] = None) -> dict[int, bytes]:
+    """Return {page number: single-page PDF bytes} for the requested (default all) pages."""
+    import fitz
+
+    split = {}
+    with fitz.open(pdf_path) as doc:
+        for page_num in (range(len(doc)) if pages is None else pages):
+            single = fitz.open()
+            single.insert_pdf(doc, from_page=page_num, to_page=page_num)
+            split[page_num] = single.tobytes()
+            single.close()
+    return split
+
 
-def extract_text_from_pdf(pdf_path: str, api_key: str) -> str:
+def ocr_headers(api_key: str) -> dict:
+    """Request headers for OCR.space; raises OCRError when no API key is configured."""
+    if not api_key:
+        raise OCRError("OCR_API_KEY is not set; set it in the environment or .env to OCR scanned pages.")
+    return {'apikey': api_key}
+
+
+def ocr_document(data: bytes, api_key: str, options: dict = OCR_OPTIONS) -> tuple[str, int]:
+    """
+    Send one PDF (usually a single page) to OCR.space, retrying transient failures.
+
+    Network errors, timeouts, HTTP 429/5xx and processing errors are retried
+    with exponential backoff up to OCR_MAX_RETRIES times.
+
+    Returns:
+        tuple: (extracted text, number of attempts made).
+    """
+    headers = ocr_headers(api_key)
+    for attempt in range(1, OCR_MAX_RETRIES + 2):
+        try:
+            response = _session.post(
+                OCR_SPACE_URL,
+                files={'file': ('page.pdf', data, 'application/pdf')},
+                data=options,
+                headers=headers,
+                timeout=(OCR_CONNECT_TIMEOUT, OCR_READ_TIMEOUT),
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                raise OCRError(f"OCR HTTP {response.status_code}")
+            result = response.json()
+            if result.get('IsErroredOnProcessing'):
+                raise OCRError(f"OCR Error: {result.get('ErrorMessage', 'Unknown error')}")
+            text = "".join(parsed['ParsedText'] for parsed in result.get('ParsedResults', []))
+            return text, attempt
+        except (requests.RequestException, ValueError, OCRError):
+            if attempt > OCR_MAX_RETRIES:
+                raise
+            time.sleep(min(2 ** (attempt - 1), 8))
+
+
+def extract_pages(
+    pdf_path: str,
+    api_key: str,
+    pages: list[int] = None,
+    use_cache: bool = True,
+    max_workers: int = OCR_MAX_WORKERS,
+    options: dict = OCR_OPTIONS,
+) -> list[OCRPage]:
+    """
+    OCR a PDF page by page on a bounded thread pool.
+
+    Args:
+        pdf_path (str): Path to the local PDF file.
+        api_key (str): Your OCR.space API key.
+        pages (list[int]): Zero-based pages to OCR; defaults to every page.
+        use_cache (bool): Read from and write to the OCR result cache.
+        max_workers (int): Maximum concurrent OCR requests.
+        options (dict): OCR.space request options (engine, scale, ...).
+
+    Returns:
+        list[OCRPage]: One entry per page, in page order.
+    """
+    digest = file_digest(pdf_path)
+    results = {}
+    todo = []
+    for page_num in pages if pages is not None else range(page_count(pdf_path)):
+        cached = get_ocr_cache().get(ocr_cache_key(digest, page_num, options)) if use_cache else None
+        if cached is not None:
+            results[page_num] = OCRPage(page=page_num, text=cached, cached=True)
+        else:
+            todo.append(page_num)
+
+    def _ocr(page_num: int, data: bytes) -> OCRPage:
+        started = time.perf_counter()
+        with span("ocr.page", page=page_num):
+            text, attempts = ocr_document(data, api_key, options)
+        if use_cache:
+            get_ocr_cache().set(ocr_cache_key(digest, page_num, options), text)
+        return OCRPage(page=page_num, text=text, seconds=time.perf_counter() - started, attempts=attempts)
+
+    if todo:
+        # Fail before splitting the PDF when OCR cannot run at all
+        ocr_headers(api_key)
+        with span("ocr", pages=len(todo)):
+            split = split_pdf_pages(pdf_path, todo)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(todo)))) as pool:
+                futures = [pool.submit(_ocr, page_num, split[page_num]) for page_num in todo]
+                for future in futures:
+                    page = future.result()
+                    results[page.page] = page
+
+    return [results[page_num] for page_num in sorted(results)]
+
+
+def extract_text_from_pdf(pdf_path: str, api_key: str, use_cache: bool = True) -> str:
     """
     Extracts text from a handwritten or scanned PDF using OCR.space API.
-    
+
+    Pages are OCR'd in parallel and reassembled in order; results are cached
+    on disk per page by file content and OCR options.
+
     Args:
         pdf_path (str): Path to the local PDF file.
         api_key (str): Your OCR.space API key.
-    
+        use_cache (bool): Read from and write to the OCR result cache.
+
     Returns:
         str: Extracted text from the PDF.
     """
-    with open(pdf_path, 'rb') as f:
-        files = {'file': f}
-        payload = {
-            'language': 'eng',
-            'isOverlayRequired': False,
-            'filetype': 'PDF',
-            'detectOrientation': True,
-            'isCreateSearchablePdf': False,
-            'isSearchablePdfHideTextLayer': False,
-            'scale': True,
-            'isTable': False,
-            'OCREngine': 2
-        }
-        headers = {'apikey': api_key}
-
-        response = requests.post(
-            'https://api.ocr.space/parse/image',
-            files=files,
-            data=payload,
-            headers=headers
-        )
-
-    result = response.json()
-    if result.get('IsErroredOnProcessing'):
-        raise Exception(f"OCR Error: {result.get('ErrorMessage', 'Unknown error')}")
-
-    return result['ParsedResults'][0]['ParsedText']
+    pages = extract_pages(pdf_path, api_key, use_cache=use_cache)
+    return "\n".join(page.text for page in pages)
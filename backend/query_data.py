@@ -1,11 +1,18 @@
 import argparse
-import chromadb
-from sentence_transformers import SentenceTransformer
+import os
+from context_assembler import MMR_CANDIDATE_FACTOR, assemble_context
+from embeddings import get_embedding_service
+from ingest import index_generation
+from retrieval import hybrid_search
+from sparse_index import get_sparse_index
+from vector_store import get_vector_store
 
 CHROMA_PATH = "chroma"
 COLLECTION_NAME = "documents"
 K = 3  # Number of top results to retrieve
-RELEVANCE_THRESHOLD = 0.7
+# Minimum cosine similarity between the query and a retrieved chunk; BM25's top hits are exempt.
+# Tune it against the corpus with `python -m benchmarks.bench_relevance`.
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0.3"))
 
 PROMPT_TEMPLATE = """
 Answer the question based only on the following context:
@@ -26,34 +33,27 @@ def main():
     retrieve_relevant_chunks(query_text)
 
 def retrieve_relevant_chunks(query_text: str):
-    # Initialize Chroma client and load the collection
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_collection(COLLECTION_NAME)
+    # Open the configured vector store (see VECTOR_BACKEND)
+    collection = get_vector_store(CHROMA_PATH, COLLECTION_NAME)
+    sparse = get_sparse_index(COLLECTION_NAME, index_generation(CHROMA_PATH), collection)
     
-    # Load the sentence transformer model
-    model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-    query_embedding = model.encode(query_text).tolist()
+    # Embed the query with the shared sentence transformer model
+    query_embedding = get_embedding_service().encode(query_text).tolist()
     
-    # Perform similarity search
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=K
-    )
+    # Fuse dense and BM25 results, dropping chunks below the relevance threshold
+    hits = hybrid_search(collection, sparse, query_text, query_embedding, K * MMR_CANDIDATE_FACTOR, RELEVANCE_THRESHOLD)
     
-    if not results["documents"] or len(results["documents"][0]) == 0:
+    if not hits:
         print("Unable to find matching results.")
         return
     
-    context_texts = results["documents"][0]
-    metadata = results["metadatas"][0]
-    
-    context = "\n\n---\n\n".join(context_texts)
-    prompt = PROMPT_TEMPLATE.format(context=context, question=query_text)
+    # Pick K diverse chunks, merge overlapping neighbours and fit the context to the token budget
+    assembled = assemble_context(hits, K)
+    prompt = PROMPT_TEMPLATE.format(context=assembled["context"], question=query_text)
     print("Generated Prompt:\n", prompt)
     
     # Display sources
-    sources = [meta.get("source", "Unknown") for meta in metadata]
-    print(f"Sources: {sources}")
+    print(f"Sources: {assembled['sources']} ({assembled['tokens']} context tokens)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+# retrieval.py
+import os
+
+import numpy as np
+
+from metrics import span
+
+# Rank offset in reciprocal-rank fusion; larger values flatten the gap between top ranks.
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Candidates taken from each of the dense and sparse retrievers before fusion.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# BM25's top hits kept whatever their cosine similarity, so lexical matches survive the threshold.
+LEXICAL_KEEP = int(os.getenv("LEXICAL_KEEP", "5"))
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse ranked ID lists into one, scoring each ID by the sum of 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def cosine_similarities(query_embedding, embeddings) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32).ravel()
+    matrix = np.asarray(embeddings, dtype=np.float32).reshape(-1, query.shape[0])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return (matrix @ query) / np.maximum(norms, 1e-12)
+
+
+def hybrid_search_many(
+    store,
+    sparse_index,
+    query_texts: list[str],
+    query_embeddings: list,
+    k: int,
+    threshold: float = None,
+    candidates: int = HYBRID_CANDIDATES,
+    lexical_keep: int = LEXICAL_KEEP,
+) -> list[list[dict]]:
+    """
+    Dense + BM25 retrieval fused with reciprocal-rank fusion, for several queries at once.
+
+    Both retrievers return `candidates` IDs per query, which are fused, and
+    the stored embeddings of all fused candidates are fetched in one call.
+    The fused list is then pruned: candidates whose cosine similarity to the
+    query is below `threshold` are dropped, except BM25's top `lexical_keep`
+    hits, whose relevance the embedding may not reflect (exact terms, codes,
+    names). The top `k` of what remains are kept.
+
+    Args:
+        store: Vector store (or Chroma collection) holding the chunks.
+        sparse_index (BM25Index): Sparse index over the same chunks, or None for dense-only.
+        query_texts (list[str]): Query texts, used for BM25.
+        query_embeddings (list): One embedding per query.
+        k (int): Results per query.
+        threshold (float): Minimum cosine similarity, or None to keep everything.
+        candidates (int): Candidates per retriever before fusion.
+        lexical_keep (int): BM25 top hits exempt from `threshold`.
+
+    Returns:
+        list[list[dict]]: Per query, hits with id, document, metadata,
+        similarity, (fused) score and embedding, best first.
+    """
+    if not query_texts:
+        return []
+    candidates = max(candidates, k)
+    with span("vector_store.query", queries=len(query_texts)):
+        dense = store.query(
+            query_embeddings=[np.asarray(e, dtype=np.float32).tolist() for e in query_embeddings],
+            n_results=candidates,
+            include=["distances"],
+        )
+    if sparse_index is not None:
+        with span("bm25", queries=len(query_texts)):
+            sparse = sparse_index.search_many(query_texts, candidates)
+    else:
+        sparse = [[] for _ in query_texts]
+
+    fused = [
+        reciprocal_rank_fusion([dense_ids, [chunk_id for chunk_id, _ in sparse_hits]])
+        for dense_ids, sparse_hits in zip(dense["ids"], sparse)
+    ]
+    wanted = list(dict.fromkeys(chunk_id for ranking in fused for chunk_id, _ in ranking))
+    if not wanted:
+        return [[] for _ in query_texts]
+
+    with span("vector_store.get", ids=len(wanted)):
+        stored = store.get(ids=wanted, include=["documents", "metadatas", "embeddings"])
+    rows = {chunk_id: row for row, chunk_id in enumerate(stored["ids"])}
+
+    results = []
+    for ranking, query_embedding, sparse_hits in zip(fused, query_embeddings, sparse):
+        lexical = {chunk_id for chunk_id, _ in sparse_hits[:lexical_keep]}
+        ranking = [(chunk_id, score) for chunk_id, score in ranking if chunk_id in rows]
+        if not ranking:
+            results.append([])
+            continue
+        similarities = cosine_similarities(query_embedding, [stored["embeddings"][rows[chunk_id]] for chunk_id, _ in ranking])
+        hits = []
+        for (chunk_id, score), similarity in zip(ranking, similarities):
+            if threshold is not None and similarity < threshold and chunk_id not in lexical:
+                continue
+            row = rows[chunk_id]
+            hits.append({
+                "id": chunk_id,
+                "document": stored["documents"][row],
+                "metadata": stored["metadatas"][row] or {},
+                "similarity": float(similarity),
+                "score": score,
+                "embedding": stored["embeddings"][row],
+            })
+            if len(hits) == k:
+                break
+        results.append(hits)
+    return results
+
+
+def hybrid_search(
+    store,
+    sparse_index,
+    query_text: str,
+    query_embedding,
+    k: int,
+    threshold: float = None,
+    candidates: int = HYBRID_CANDIDATES,
+    lexical_keep: int = LEXICAL_KEEP,
+) -> list[dict]:
+    return hybrid_search_many(store, sparse_index, [query_text], [query_embedding], k, threshold, candidates, lexical_keep)[0]
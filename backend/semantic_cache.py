@@ -0,0 +1,97 @@
+# semantic_cache.py
+import os
+import threading
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+
+
+class SemanticCache:
+    """
+    Answer cache for paraphrased questions.
+
+    Stores (unit-normalized query embedding, retrieved chunk IDs, model, answer)
+    with the embeddings stacked in one NumPy matrix, so a lookup is a single
+    matrix-vector product. A cached answer is reused only when the new query is
+    at least `threshold` cosine-similar, retrieved the same chunks and asked the
+    same model. Entries are dropped whenever the index generation changes, i.e.
+    after any re-ingest. When full, the oldest entry is overwritten.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, capacity: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._matrix = None
+        self._entries = []
+        self._next = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _sync_generation(self, generation):
+        if generation != self._generation:
+            self._matrix = None
+            self._entries = []
+            self._next = 0
+            self._generation = generation
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding, chunk_ids: list[str], model: str, generation=None):
+        """Return a cached answer for a similar query over the same chunks, or None."""
+        query = self._normalize(embedding)
+        key = (tuple(chunk_ids), model)
+        with self._lock:
+            self._sync_generation(generation)
+            if self._entries:
+                similarities = self._matrix[:len(self._entries)] @ query
+                for index in np.argsort(-similarities):
+                    if similarities[index] < self.threshold:
+                        break
+                    if self._entries[index][0] == key:
+                        self.hits += 1
+                        return self._entries[index][1]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, chunk_ids: list[str], model: str, answer: str, generation=None):
+        query = self._normalize(embedding)
+        with self._lock:
+            self._sync_generation(generation)
+            if self.capacity <= 0:
+                return
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, query.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._matrix[slot] = query
+            entry = ((tuple(chunk_ids), model), answer)
+            if slot < len(self._entries):
+                self._entries[slot] = entry
+            else:
+                self._entries.append(entry)
+            self._next = (slot + 1) % self.capacity
+
+    def invalidate(self):
+        with self._lock:
+            self._sync_generation(object())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+SEMANTIC_CACHE = SemanticCache()
@@ -0,0 +1,113 @@
+# serve.py
+import argparse
+import gc
+import multiprocessing
+import os
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+# Worker processes; each runs requests on WEB_THREADS threads.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(CPU_COUNT)))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "4"))
+BIND = os.getenv("BIND", "0.0.0.0:5000")
+# OCR and LLM calls can take minutes; workers silent for longer are restarted.
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "300"))
+# Torch intra-op threads per worker; by default the cores are split between workers.
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(max(1, CPU_COUNT // max(1, WEB_CONCURRENCY)))))
+
+# Read by OpenMP/MKL when torch is first imported, so they must be set before preloading.
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_THREADS))
+# HuggingFace tokenizers' own thread pool does not survive fork.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def preload():
+    """
+    Load what every worker needs once, in the master, before the workers fork.
+
+    The embedding model weights, memory-mapped vector index and BM25 weights
+    are then shared by all workers through copy-on-write pages. No forward
+    pass is run here: torch's thread pools are started in each worker instead.
+    Chroma is not opened, since its client is not safe to use across fork.
+    """
+    from app import CHROMA_PATH, COLLECTION_NAME
+    from embeddings import get_embedding_service
+    from ingest import index_generation
+    from sparse_index import get_sparse_index
+    from startup import check_nltk_data
+    from vector_store import VECTOR_BACKEND, get_vector_store
+
+    check_nltk_data()
+    get_embedding_service().model
+    store = get_vector_store(CHROMA_PATH, COLLECTION_NAME) if VECTOR_BACKEND != "chroma" else None
+    get_sparse_index(COLLECTION_NAME, index_generation(CHROMA_PATH), store).search("warmup", 1)
+    # Keep the garbage collector from writing to (and so copying) the preloaded objects' pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Per-worker start-up: cap torch threads, start span export, warm the model and take free job worker slots."""
+    import sys
+
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(TORCH_THREADS)
+    from app import get_ingest_jobs
+    from embeddings import get_embedding_service
+    from metrics import setup_tracing
+
+    setup_tracing()
+    get_embedding_service().warmup_async()
+    # JOB_WORKERS bounds ingestion for the whole server, not per worker process
+    ingest_jobs = get_ingest_jobs()
+    slots = ingest_jobs.start_shared()
+    print(f"Worker {os.getpid()} runs {slots} of {ingest_jobs.workers} ingestion job slots.")
+
+
+def options(asgi: bool = False, workers: int = WEB_CONCURRENCY, threads: int = WEB_THREADS, bind: str = BIND) -> dict:
+    """Gunicorn settings for the Flask app (gthread workers) or the ASGI app (uvicorn workers)."""
+    settings = {
+        "bind": bind,
+        "workers": workers,
+        "timeout": WORKER_TIMEOUT,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+    if asgi:
+        settings["worker_class"] = "uvicorn.workers.UvicornWorker"
+    else:
+        settings["worker_class"] = "gthread"
+        settings["threads"] = threads
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the backend with a pre-fork multi-worker server.")
+    parser.add_argument("--asgi", action="store_true", help="Serve asgi:app on uvicorn workers (async LLM endpoints).")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--threads", type=int, default=WEB_THREADS, help="Request threads per gthread worker.")
+    parser.add_argument("--bind", default=BIND)
+    args = parser.parse_args()
+
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options(args.asgi, args.workers, args.threads, args.bind).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            preload()
+            if args.asgi:
+                from asgi import app
+            else:
+                from app import app
+            return app
+
+    print(f"Serving on {args.bind} with {args.workers} {'uvicorn' if args.asgi else 'gthread'} workers, {TORCH_THREADS} torch threads each.")
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# sparse_index.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+SPARSE_INDEX_PATH = os.getenv("SPARSE_INDEX_PATH", "sparse_index")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk texts, keyed by chunk ID.
+
+    Term frequencies are kept in a sparse chunks x terms matrix. The BM25
+    weight of every (chunk, term) pair is precomputed once per change and
+    stored column-major, so scoring a query is a column slice and one sparse
+    product, and scoring many queries is one sparse-matrix product. Deleted
+    chunks are tombstoned until `persist`, which writes the matrix as .npz
+    and the IDs and vocabulary as JSON.
+    """
+
+    reloadable = True
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        from scipy import sparse
+
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.generation = None
+        self._lock = threading.RLock()
+        self._ids = []
+        self._rows = {}
+        self._vocabulary = {}
+        self._tf = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._pending = []
+        self._alive = np.empty(0, dtype=bool)
+        self._weights = None
+        self.load()
+
+    def _files(self):
+        return os.path.join(self.path, "tf.npz"), os.path.join(self.path, "terms.json")
+
+    def load(self):
+        from scipy import sparse
+
+        matrix_path, terms_path = self._files()
+        if not (os.path.exists(matrix_path) and os.path.exists(terms_path)):
+            return
+        with self._lock:
+            with open(terms_path, "r", encoding="utf-8") as f:
+                terms = json.load(f)
+            self._tf = sparse.load_npz(matrix_path).tocsr()
+            self._ids = terms["ids"]
+            self._vocabulary = terms["vocabulary"]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._alive = np.ones(len(self._ids), dtype=bool)
+            self._weights = None
+
+    def persist(self):
+        from scipy import sparse
+
+        with self._lock:
+            tf = self._matrix()
+            if not self._alive.all():
+                keep = np.flatnonzero(self._alive)
+                self._tf = tf[keep]
+                self._ids = [self._ids[row] for row in keep]
+                self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+                self._alive = np.ones(len(self._ids), dtype=bool)
+                self._weights = None
+            os.makedirs(self.path, exist_ok=True)
+            matrix_path, terms_path = self._files()
+            sparse.save_npz(f"{matrix_path}.tmp.npz", self._tf)
+            with open(f"{terms_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": self._ids, "vocabulary": self._vocabulary}, f)
+            os.replace(f"{matrix_path}.tmp.npz", matrix_path)
+            os.replace(f"{terms_path}.tmp", terms_path)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids: list[str], texts: list[str]):
+        """Index `texts` under `ids`, replacing chunks that are already indexed."""
+        with self._lock:
+            self.delete([chunk_id for chunk_id in ids if chunk_id in self._rows])
+            for chunk_id, text in zip(ids, texts):
+                counts = {}
+                for token in tokenize(text):
+                    column = self._vocabulary.setdefault(token, len(self._vocabulary))
+                    counts[column] = counts.get(column, 0) + 1
+                self._rows[chunk_id] = len(self._ids)
+                self._ids.append(chunk_id)
+                self._pending.append(counts)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._weights = None
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._rows.pop(chunk_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._weights = None
+
+    def _matrix(self) -> sparse.csr_matrix:
+        """Term-frequency matrix including rows added since the last call."""
+        from scipy import sparse
+
+        if self._pending:
+            columns, counts, indptr = [], [], [0]
+            for row in self._pending:
+                columns.extend(row.keys())
+                counts.extend(row.values())
+                indptr.append(len(columns))
+            added = sparse.csr_matrix(
+                (np.asarray(counts, dtype=np.float32), np.asarray(columns, dtype=np.int64), np.asarray(indptr)),
+                shape=(len(self._pending), len(self._vocabulary)),
+            )
+            self._tf.resize((self._tf.shape[0], len(self._vocabulary)))
+            self._tf = sparse.vstack([self._tf, added], format="csr")
+            self._pending = []
+        elif self._tf.shape[1] < len(self._vocabulary):
+            self._tf.resize((self._tf.shape[0], len(self._vocabulary)))
+        return self._tf
+
+    def _bm25_weights(self) -> sparse.csc_matrix:
+        from scipy import sparse
+
+        if self._weights is not None:
+            return self._weights
+        tf = self._matrix()
+        alive = self._alive.astype(np.float32)
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        n = max(int(alive.sum()), 1)
+        average_length = max(float(lengths @ alive) / n, 1e-9)
+
+        # Document frequency over live chunks only.
+        df = np.asarray((sparse.diags(alive) @ (tf > 0)).sum(axis=0)).ravel()
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        rows = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / average_length)
+        data = idf[tf.indices] * tf.data * (self.k1 + 1.0) / (tf.data + norm) * alive[rows]
+        self._weights = sparse.csr_matrix((data.astype(np.float32), tf.indices, tf.indptr), shape=tf.shape).tocsc()
+        return self._weights
+
+    def search_many(self, queries: list[str], k: int) -> list[list[tuple[str, float]]]:
+        """Top-`k` (chunk ID, BM25 score) pairs for each query, best first; zero scores are dropped."""
+        from scipy import sparse
+
+        with self._lock:
+            if not self._rows or k <= 0:
+                return [[] for _ in queries]
+            weights = self._bm25_weights()
+            columns, query_rows = [], []
+            for i, query in enumerate(queries):
+                for token in set(tokenize(query)):
+                    column = self._vocabulary.get(token)
+                    if column is not None:
+                        columns.append(column)
+                        query_rows.append(i)
+            selector = sparse.csr_matrix(
+                (np.ones(len(columns), dtype=np.float32), (columns, query_rows)),
+                shape=(weights.shape[1], len(queries)),
+            )
+            scores = (weights @ selector).toarray()
+            ids = self._ids
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for i in range(len(queries)):
+            candidates = top[:, i][np.argsort(-scores[top[:, i], i])]
+            results.append([(ids[row], float(scores[row, i])) for row in candidates if scores[row, i] > 0])
+        return results
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        return self.search_many([query], k)[0]
+
+    def rebuild(self, store, batch_size: int = 5000):
+        """
+        Index every chunk currently in the vector `store` (e.g. data ingested before this index existed).
+
+        The store is read a page of `batch_size` documents at a time, so
+        only the token counts, not the texts, are held for the whole store.
+        """
+        with self._lock:
+            offset = 0
+            while True:
+                stored = store.get(include=["documents"], limit=batch_size, offset=offset)
+                if not stored["ids"]:
+                    break
+                self.add(stored["ids"], stored["documents"])
+                offset += len(stored["ids"])
+            self.persist()
+        print(f"Built the BM25 index from {self.count()} stored chunks.")
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sparse_index(collection_name: str, generation=None, store=None) -> BM25Index:
+    """
+    Return the process-wide BM25 index for `collection_name`.
+
+    It is reloaded from disk when the index generation changes. When `store`
+    is given and the index is empty while the store is not, it is first built
+    from the store's documents.
+    """
+    with _indexes_lock:
+        index = _indexes.get(collection_name)
+        if index is None or index.generation != generation:
+            index = BM25Index(os.path.join(SPARSE_INDEX_PATH, collection_name))
+            index.generation = generation
+            if store is not None and index.count() == 0 and store.count() > 0:
+                index.rebuild(store)
+            _indexes[collection_name] = index
+    return index
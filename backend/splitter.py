@@ -0,0 +1,169 @@
+# splitter.py
+from __future__ import annotations
+
+import copy
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from summarizer import count_tokens
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# RecursiveCharacterTextSplitter's defaults: paragraphs, lines, words, characters.
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+# Same, with sentence ends tried before falling back to words.
+SENTENCE_SEPARATORS = ["\n\n", "\n", r"(?<=[.!?])\s+", " ", ""]
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int
+    end: int
+
+
+class StreamingTextSplitter:
+    """
+    Generator-based replacement for LangChain's RecursiveCharacterTextSplitter.
+
+    Text is split recursively on `separators` exactly like the LangChain
+    splitter (separators kept at the start of the following piece, chunks
+    stripped of surrounding whitespace), but pieces are tracked as offsets
+    into the source text instead of copied strings, and chunks are yielded as
+    soon as they are complete. Each chunk carries its exact start and end
+    offsets.
+
+    With `compat=True`, `start_index` is computed the way LangChain's
+    create_documents does (searching for the chunk text near the previous
+    one), so the output is identical to RecursiveCharacterTextSplitter with
+    add_start_index=True, including its misplaced offsets for repeated text.
+
+    Args:
+        chunk_size (int): Maximum chunk size, in characters or tokens.
+        chunk_overlap (int): Target overlap between consecutive chunks.
+        length (str): "chars" or "tokens" (tiktoken cl100k_base).
+        sentence_aware (bool): Prefer sentence ends over word breaks.
+        compat (bool): Reproduce LangChain's start_index values.
+        separators (list[str]): Regular expressions to split on, coarsest first.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 300,
+        chunk_overlap: int = 100,
+        length: str = "chars",
+        sentence_aware: bool = False,
+        compat: bool = False,
+        separators: list[str] = None,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller.")
+        if length not in ("chars", "tokens"):
+            raise ValueError(f"Unknown length unit: {length}")
+        if compat and sentence_aware:
+            raise ValueError("Compatibility mode uses LangChain's separators; it cannot be sentence-aware.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length = length
+        self.compat = compat
+        if separators is None:
+            separators = SENTENCE_SEPARATORS if sentence_aware else [re.escape(s) for s in DEFAULT_SEPARATORS]
+        self._separators = [re.compile(s) if s else None for s in separators]
+
+    def _piece_length(self, text: str, start: int, end: int) -> int:
+        if self.length == "chars":
+            return end - start
+        return count_tokens(text[start:end])
+
+    def _pieces(self, text: str, start: int, end: int, separator) -> list[tuple[int, int]]:
+        """Split text[start:end] before each separator match, dropping empty pieces."""
+        if separator is None:
+            return [(i, i + 1) for i in range(start, end)]
+        boundaries = [start]
+        for match in separator.finditer(text, start, end):
+            if match.start() > boundaries[-1]:
+                boundaries.append(match.start())
+        boundaries.append(end)
+        return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b > a]
+
+    def _split(self, text: str, start: int, end: int, separators: list) -> Iterator[tuple[int, int]]:
+        """Yield (start, end) spans of unstripped chunks of text[start:end]."""
+        separator, remaining = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if candidate is None:
+                separator = None
+                break
+            if candidate.search(text, start, end):
+                separator, remaining = candidate, separators[i + 1:]
+                break
+
+        good = []
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            piece_length = self._piece_length(text, piece_start, piece_end)
+            if piece_length < self.chunk_size:
+                good.append((piece_start, piece_end, piece_length))
+                continue
+            if good:
+                yield from self._merge(good)
+                good = []
+            if remaining:
+                yield from self._split(text, piece_start, piece_end, remaining)
+            else:
+                yield piece_start, piece_end
+        if good:
+            yield from self._merge(good)
+
+    def _merge(self, pieces: list[tuple[int, int, int]]) -> Iterator[tuple[int, int]]:
+        """Pack consecutive pieces into chunks with overlap, as LangChain's _merge_splits does."""
+        current = deque()
+        total = 0
+        for piece in pieces:
+            piece_length = piece[2]
+            if total + piece_length > self.chunk_size and current:
+                yield current[0][0], current[-1][1]
+                while total > self.chunk_overlap or (total + piece_length > self.chunk_size and total > 0):
+                    total -= current.popleft()[2]
+            current.append(piece)
+            total += piece_length
+        if current:
+            yield current[0][0], current[-1][1]
+
+    def iter_chunks(self, text: str) -> Iterator[Chunk]:
+        """Yield the chunks of `text` with their offsets, as they are produced."""
+        index, previous_length = 0, 0
+        for start, end in self._split(text, 0, len(text), self._separators):
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if not stripped:
+                continue
+            if self.compat:
+                index = text.find(stripped, max(0, index + previous_length - self.chunk_overlap))
+                previous_length = len(stripped)
+                start = index
+            else:
+                start += len(chunk) - len(chunk.lstrip())
+            yield Chunk(stripped, start, start + len(stripped))
+
+    def split_text(self, text: str) -> list[str]:
+        return [chunk.text for chunk in self.iter_chunks(text)]
+
+    def iter_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Split each document as it arrives, yielding chunk Documents.
+
+        Chunks keep a copy of their document's metadata plus `start_index`,
+        matching RecursiveCharacterTextSplitter(add_start_index=True).
+        """
+        from langchain.schema import Document
+
+        for document in documents:
+            for chunk in self.iter_chunks(document.page_content):
+                metadata = copy.deepcopy(document.metadata)
+                metadata["start_index"] = chunk.start
+                yield Document(page_content=chunk.text, metadata=metadata)
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        return list(self.iter_documents(documents))
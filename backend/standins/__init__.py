@@ -0,0 +1 @@
+# Local stand-ins for the remote services the backend depends on.
@@ -0,0 +1,119 @@
+# standins/base.py
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Request handler base for local service stand-ins.
+
+    Subclasses implement `handle_post(path, body)` and answer with `send_json`
+    or, for streaming APIs, `send_stream`. The server's `latency` (seconds) is
+    slept before every response, `failure_rate` of requests are answered with
+    HTTP 503 instead, and streamed parts are spaced `token_latency` apart.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients close streams early, e.g. after Groq's [DONE] event
+            pass
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, parts, content_type: str):
+        """Send each string in `parts` as its own HTTP chunk, waiting `token_latency` between them."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for part in parts:
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            data = part.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def simulate_conditions(self) -> bool:
+        """Apply the configured latency; return False if this request should fail."""
+        if self.server.latency:
+            time.sleep(self.server.latency * random.uniform(0.8, 1.2))
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self.send_json({"error": "simulated failure"}, status=503)
+            return False
+        return True
+
+    def do_POST(self):
+        body = self.read_body()
+        if not self.simulate_conditions():
+            return
+        self.handle_post(self.path, body)
+
+    def handle_post(self, path: str, body: bytes):
+        raise NotImplementedError
+
+
+def serve(
+    handler_cls,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    failure_rate: float = 0.0,
+    verbose: bool = False,
+    token_latency: float = 0.0,
+):
+    """
+    Start `handler_cls` on a background thread.
+
+    Returns:
+        tuple: (server, base_url). Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), handler_cls)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.verbose = verbose
+    server.token_latency = token_latency
+    thread = threading.Thread(target=server.serve_forever, name=handler_cls.__name__, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503.")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed tokens.")
+    parser.add_argument("--verbose", action="store_true")
+
+
+def run_forever(handler_cls, args, path: str = ""):
+    server, base_url = serve(handler_cls, args.host, args.port, args.latency, args.failure_rate, args.verbose, args.token_latency)
+    print(f"{handler_cls.__name__} listening on {base_url}{path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,39 @@
+# standins/chat.py
+"""Completions shared by the Groq and Ollama stand-ins."""
+import hashlib
+import json
+import random
+import re
+
+WORDS = ["time", "division", "duplexing", "shares", "one", "band", "between", "uplink", "and", "downlink", "traffic"]
+DEFAULT_REPLY_WORDS = 120
+
+
+def prompt_of(payload: dict) -> str:
+    """Text of the last user message in a chat request."""
+    messages = payload.get("messages") or [{}]
+    return str(messages[-1].get("content", ""))
+
+
+def reply(prompt: str, words: int = DEFAULT_REPLY_WORDS) -> str:
+    """
+    Deterministic completion for `prompt`.
+
+    Question-generation prompts (which ask for a JSON array) get a valid JSON
+    array of 5 question/answer pairs, so callers exercise their parsing path.
+    Anything else gets `words` words picked from a fixed vocabulary, seeded
+    by the prompt so repeated prompts get the same answer.
+    """
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+    if "JSON array" in prompt:
+        return json.dumps([
+            {"question": f"Stand-in question {i + 1}?", "answer": f"Stand-in answer {i + 1} ({seed % 1000})."}
+            for i in range(5)
+        ])
+    rng = random.Random(seed)
+    return "- " + " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def tokens(text: str) -> list[str]:
+    """Split `text` into word-and-whitespace tokens, as a streaming API would deliver it."""
+    return re.findall(r"\s*\S+", text) or [text]
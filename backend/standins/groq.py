@@ -0,0 +1,69 @@
+# standins/groq.py
+"""
+Offline stand-in for Groq's OpenAI-compatible `/openai/v1/chat/completions` endpoint.
+
+Completions are deterministic (see standins.chat). With `"stream": true` the
+reply is sent as server-sent `chat.completion.chunk` events, one per token,
+ending with `data: [DONE]`.
+
+    python -m standins.groq --port 8766 --latency 0.8 --token-latency 0.01
+    GROQ_API_URL=http://127.0.0.1:8766/openai/v1/chat/completions python app.py
+"""
+import argparse
+import json
+import time
+
+from standins.base import StandInHandler, add_arguments, run_forever, serve
+from standins.chat import prompt_of, reply, tokens
+
+PATH = "/openai/v1/chat/completions"
+
+
+class GroqHandler(StandInHandler):
+    def handle_post(self, path: str, body: bytes):
+        if not path.startswith(PATH):
+            self.send_json({"error": "not found"}, status=404)
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self.send_json({"error": {"message": "Invalid API Key"}}, status=401)
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self.send_json({"error": {"message": "Invalid JSON"}}, status=400)
+            return
+
+        model = payload.get("model", "")
+        text = reply(prompt_of(payload))
+        created = int(time.time())
+        if payload.get("stream"):
+            events = (
+                "data: " + json.dumps({
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }) + "\n\n"
+                for token in tokens(text)
+            )
+            self.send_stream(list(events) + ["data: [DONE]\n\n"], "text/event-stream")
+            return
+
+        self.send_json({
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        })
+
+
+def start(**kwargs):
+    """Start the stand-in on a background thread and return (server, endpoint URL)."""
+    server, base_url = serve(GroqHandler, **kwargs)
+    return server, base_url + PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    run_forever(GroqHandler, parser.parse_args(), PATH)
@@ -0,0 +1,78 @@
+# standins/ocr_space.py
+"""
+Offline stand-in for the OCR.space `/parse/image` endpoint.
+
+Uploaded PDFs are answered with their embedded text layer (one ParsedResult per
+page, like the real API), so OCR output is deterministic and checkable.
+Files without a text layer get a placeholder naming the page and file digest.
+
+    python -m standins.ocr_space --port 8765 --latency 0.5
+    OCR_SPACE_URL=http://127.0.0.1:8765/parse/image python app.py
+"""
+import argparse
+import hashlib
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from standins.base import StandInHandler, add_arguments, run_forever, serve
+
+PATH = "/parse/image"
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    """Return {field name: bytes} for a multipart/form-data body."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+def page_texts(data: bytes) -> list[str]:
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    try:
+        import fitz
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            texts = [page.get_text("text") for page in doc]
+    except Exception:
+        texts = [""]
+    return [text if text.strip() else f"Stand-in OCR text for page {i + 1} of {digest}\n" for i, text in enumerate(texts)]
+
+
+class OCRSpaceHandler(StandInHandler):
+    def handle_post(self, path: str, body: bytes):
+        if not path.startswith(PATH):
+            self.send_json({"error": "not found"}, status=404)
+            return
+        if self.headers.get("apikey") is None:
+            self.send_json({"IsErroredOnProcessing": True, "ErrorMessage": ["Missing apikey"]})
+            return
+
+        fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+        if "file" not in fields:
+            self.send_json({"IsErroredOnProcessing": True, "ErrorMessage": ["No file uploaded"]})
+            return
+
+        self.send_json({
+            "IsErroredOnProcessing": False,
+            "ParsedResults": [
+                {"ParsedText": text, "FileParseExitCode": 1}
+                for text in page_texts(fields["file"])
+            ],
+        })
+
+
+def start(**kwargs):
+    """Start the stand-in on a background thread and return (server, endpoint URL)."""
+    server, base_url = serve(OCRSpaceHandler, **kwargs)
+    return server, base_url + PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    run_forever(OCRSpaceHandler, parser.parse_args(), PATH)
@@ -0,0 +1,61 @@
+# standins/ollama.py
+"""
+Offline stand-in for Ollama's `/api/chat` endpoint.
+
+Completions are deterministic (see standins.chat). With `"stream": true`
+(Ollama's default) the reply is sent as newline-delimited JSON messages, one
+per token, ending with a `"done": true` message.
+
+    python -m standins.ollama --port 11435 --latency 1.5 --token-latency 0.02
+    OLLAMA_HOST=http://127.0.0.1:11435 python app.py
+"""
+import argparse
+import json
+from datetime import datetime, timezone
+
+from standins.base import StandInHandler, add_arguments, run_forever, serve
+from standins.chat import prompt_of, reply, tokens
+
+PATH = "/api/chat"
+
+
+class OllamaHandler(StandInHandler):
+    def handle_post(self, path: str, body: bytes):
+        if not path.startswith(PATH):
+            self.send_json({"error": "not found"}, status=404)
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self.send_json({"error": "invalid JSON"}, status=400)
+            return
+
+        model = payload.get("model", "")
+        text = reply(prompt_of(payload))
+        created_at = datetime.now(timezone.utc).isoformat()
+        if payload.get("stream", True):
+            messages = [
+                json.dumps({"model": model, "created_at": created_at, "message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+                for token in tokens(text)
+            ]
+            messages.append(json.dumps({"model": model, "created_at": created_at, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n")
+            self.send_stream(messages, "application/x-ndjson")
+            return
+
+        self.send_json({
+            "model": model,
+            "created_at": created_at,
+            "message": {"role": "assistant", "content": text},
+            "done": True,
+        })
+
+
+def start(**kwargs):
+    """Start the stand-in on a background thread and return (server, OLLAMA_HOST-style base URL)."""
+    return serve(OllamaHandler, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    run_forever(OllamaHandler, parser.parse_args(), PATH)
@@ -0,0 +1,38 @@
+# startup.py
+# NLTK data used by LangChain's unstructured loaders, mapped to its path inside nltk_data.
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+}
+
+
+def check_nltk_data(resources: dict = None) -> list[str]:
+    """
+    Check that NLTK data is installed locally, without downloading anything.
+
+    Missing resources are reported with the command that installs them, so
+    that images can bake the data in at build time instead of fetching it on
+    every start.
+
+    Args:
+        resources (dict): Resource name to nltk_data path; defaults to NLTK_RESOURCES.
+
+    Returns:
+        list[str]: Names of the resources that were not found.
+    """
+    resources = NLTK_RESOURCES if resources is None else resources
+    try:
+        import nltk
+    except ImportError:
+        missing = list(resources)
+    else:
+        missing = []
+        for name, path in resources.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                missing.append(name)
+    if missing:
+        print(f"Missing NLTK data: {', '.join(missing)}. Install it with `python -m nltk.downloader {' '.join(missing)}`.")
+    return missing
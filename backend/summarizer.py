@@ -0,0 +1,136 @@
+# summarizer.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Token budget for document text placed in a single prompt (llama3-70b-8192
+# has an 8192-token context, leaving room for instructions and the answer).
+CONTEXT_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", "6000"))
+# Token budget for each piece summarized in the map step.
+PIECE_TOKENS = int(os.getenv("SUMMARY_PIECE_TOKENS", "3000"))
+MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+
+MAP_PROMPT = """You are summarizing part {index} of {total} of a longer document.
+Write a dense markdown summary of this part that keeps every key fact, definition, figure and conclusion.
+
+Text:
+{text}"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of one document.
+Merge them into a single dense markdown summary that keeps every key fact, definition, figure and conclusion, without repeating yourself.
+
+Summaries:
+{text}"""
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Offline or tiktoken missing: fall back to ~4 characters per token.
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_tokens_batch(texts: list[str], num_threads: int = 8) -> list[int]:
+    """Token counts for many texts; tiktoken encodes the batch on `num_threads` threads."""
+    encoding = _get_encoding()
+    if encoding:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts, num_threads=num_threads)]
+    return [(len(text) + 3) // 4 for text in texts]
+
+
+def _slice_tokens(text: str, max_tokens: int) -> list[str]:
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    step = max_tokens * 4
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def split_by_tokens(text: str, max_tokens: int = PIECE_TOKENS) -> list[str]:
+    """
+    Split `text` into pieces of at most `max_tokens` tokens.
+
+    Paragraphs are packed together greedily; a paragraph that is too large on
+    its own is cut at token boundaries.
+    """
+    pieces = []
+    current, current_tokens = [], 0
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens > max_tokens:
+            parts = _slice_tokens(paragraph, max_tokens)
+        else:
+            parts = [paragraph]
+        for part in parts:
+            part_tokens = tokens if len(parts) == 1 else count_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                pieces.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append("\n\n".join(current))
+    return pieces
+
+
+def condense(
+    text: str,
+    complete,
+    context_tokens: int = CONTEXT_TOKENS,
+    piece_tokens: int = PIECE_TOKENS,
+    max_workers: int = MAX_WORKERS,
+) -> str:
+    """
+    Shrink `text` until it fits in `context_tokens` with map-reduce summarization.
+
+    Text that already fits is returned unchanged. Otherwise it is split into
+    `piece_tokens` pieces that are summarized concurrently (map), and the
+    partial summaries are grouped and merged level by level (reduce) until
+    the result fits, so wall-clock time grows with the number of levels
+    rather than the number of pieces.
+
+    Args:
+        text (str): Document text.
+        complete (callable): Takes a prompt and returns the model's answer.
+        context_tokens (int): Token budget the result must fit in.
+        piece_tokens (int): Token budget per map/reduce input.
+        max_workers (int): Maximum concurrent completions.
+
+    Returns:
+        str: `text` or a summary of it that fits in `context_tokens`.
+    """
+    if count_tokens(text) <= context_tokens:
+        return text
+
+    pieces = split_by_tokens(text, piece_tokens)
+    prompts = [MAP_PROMPT.format(index=i + 1, total=len(pieces), text=piece) for i, piece in enumerate(pieces)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+        summaries = list(pool.map(complete, prompts))
+
+        combined = "\n\n".join(summaries)
+        while count_tokens(combined) > context_tokens:
+            groups = split_by_tokens(combined, piece_tokens)
+            if len(groups) >= len(summaries):
+                # The model is not shrinking its input; truncate instead of looping.
+                return _slice_tokens(combined, context_tokens)[0]
+            summaries = list(pool.map(complete, [REDUCE_PROMPT.format(text=group) for group in groups]))
+            combined = "\n\n".join(summaries)
+
+    print(f"Condensed {len(pieces)} pieces into {count_tokens(combined)} tokens.")
+    return combined
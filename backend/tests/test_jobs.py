@@ -0,0 +1,155 @@
+# tests/test_jobs.py
+import threading
+import time
+
+import jobs
+from jobs import JobQueue
+
+
+def make_queue(tmp_path, handlers, workers=1, cleanup=None):
+    return JobQueue(handlers, db_path=str(tmp_path / "jobs.db"), workers=workers, cleanup=cleanup)
+
+
+def test_slow_stage_is_not_claimed_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 0.5)
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.1)
+    runs = []
+
+    def handler(job):
+        runs.append(threading.current_thread().name)
+        # No progress() calls: only the heartbeat thread keeps the job alive
+        with job.stage("extract"):
+            time.sleep(1.5)
+        return {"ok": True}
+
+    queue = make_queue(tmp_path, {"slow": handler}, workers=2)
+    job_id = queue.submit("slow", {}, ["extract"])
+    job = queue.wait(job_id, timeout=10, poll_seconds=0.05)
+
+    assert job["status"] == "succeeded"
+    assert len(runs) == 1
+    assert job["attempts"] == 1
+
+
+def test_orphaned_job_is_claimed_again_and_stale_owner_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 0.5)
+    owners = []
+    cleaned = []
+
+    def handler(job):
+        owners.append(job.owner)
+        return {"ok": True}
+
+    queue = make_queue(tmp_path, {"ingest": handler}, workers=0, cleanup={"ingest": cleaned.append})
+    job_id = queue.submit("ingest", {}, ["index"])
+    # Simulate a worker that claimed the job and then died
+    with queue._connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'running', owner = 'dead', heartbeat = ?, attempts = 1 WHERE id = ?",
+            (time.time() - 60, job_id),
+        )
+
+    queue.workers = 1
+    queue._pid = None
+    queue.start()
+    job = queue.wait(job_id, timeout=10, poll_seconds=0.05)
+
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 2
+    assert owners and owners[0] != "dead"
+    assert len(cleaned) == 1
+
+    # The dead worker's late updates must not overwrite the new owner's outcome or clean up again
+    queue._finish(dict(job, owner="dead"), "failed", error="late")
+    queue._save_stages(job_id, "dead", [])
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["stages"] != []
+    assert len(cleaned) == 1
+
+
+def test_job_given_up_without_running_is_cleaned_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 0.5)
+    runs = []
+    cleaned = []
+
+    queue = make_queue(tmp_path, {"ingest": runs.append}, workers=0, cleanup={"ingest": cleaned.append})
+    job_id = queue.submit("ingest", {"file_path": "uploads/jobs/x/a.pdf"}, ["index"])
+    # Interrupted as many times as it may be
+    with queue._connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'running', owner = 'dead', heartbeat = ?, attempts = ? WHERE id = ?",
+            (time.time() - 60, jobs.JOB_MAX_ATTEMPTS, job_id),
+        )
+
+    queue.workers = 1
+    queue._pid = None
+    queue.start()
+    job = queue.wait(job_id, timeout=10, poll_seconds=0.05)
+
+    assert job["status"] == "failed"
+    assert runs == []
+    assert cleaned == [{"file_path": "uploads/jobs/x/a.pdf"}]
+
+
+def test_cancel_queued_job(tmp_path):
+    cleaned = []
+    queue = make_queue(tmp_path, {"ingest": lambda job: None}, workers=0, cleanup={"ingest": cleaned.append})
+    job_id = queue.submit("ingest", {"file_path": "a.pdf"}, ["index"])
+
+    job = queue.cancel(job_id)
+
+    assert job["status"] == "cancelled"
+    assert cleaned == [{"file_path": "a.pdf"}]
+    # Cancelling again is a no-op
+    queue.cancel(job_id)
+    assert len(cleaned) == 1
+
+
+def test_cancel_running_job_stops_at_next_checkpoint(tmp_path):
+    started = threading.Event()
+    reached = []
+
+    def handler(job):
+        with job.stage("index"):
+            for i in range(200):
+                started.set()
+                reached.append(i)
+                job.progress(i, 200)
+                time.sleep(0.01)
+        return {"ok": True}
+
+    queue = make_queue(tmp_path, {"ingest": handler})
+    job_id = queue.submit("ingest", {}, ["index"])
+    assert started.wait(5)
+    queue.cancel(job_id)
+    job = queue.wait(job_id, timeout=10, poll_seconds=0.05)
+
+    assert job["status"] == "cancelled"
+    assert job["stages"][0]["status"] == "failed"
+    assert len(reached) < 200
+
+
+def test_start_shared_bounds_workers_across_processes(tmp_path):
+    import multiprocessing
+
+    queue = make_queue(tmp_path, {"ingest": lambda job: None}, workers=2)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    release = context.Event()
+
+    def worker():
+        results.put(queue.start_shared())
+        release.wait(10)
+
+    processes = [context.Process(target=worker) for _ in range(4)]
+    for process in processes:
+        process.start()
+    taken = [results.get(timeout=10) for _ in processes]
+    release.set()
+    for process in processes:
+        process.join(10)
+
+    assert sum(taken) == 2
+    # Slots are released when their holders exit
+    assert queue.start_shared() == 2
@@ -0,0 +1,391 @@
+# vector_store.py
+import json
+import os
+import threading
+
+import numpy as np
+
+from ingest import WRITE_BATCH_SIZE, index_generation, max_write_batch_size
+
+# chroma | numpy | faiss-flat | faiss-hnsw | faiss-ivf
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vector_index")
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+BACKENDS = ("chroma", "numpy", "faiss-flat", "faiss-hnsw", "faiss-ivf")
+
+
+class ChromaStore:
+    """Chroma collection plus the small extra surface the in-memory stores expose."""
+
+    reloadable = False
+
+    def __init__(self, chroma_path: str, collection_name: str):
+        import chromadb
+
+        client = chromadb.PersistentClient(path=chroma_path)
+        self.collection = client.get_or_create_collection(collection_name)
+        self.max_batch_size = max_write_batch_size(client)
+        self.generation = None
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def persist(self):
+        # Chroma writes through to disk on every call.
+        pass
+
+
+def _matches(metadata: dict, where: dict) -> bool:
+    return all(metadata.get(key) == value for key, value in where.items())
+
+
+class NumpyStore:
+    """
+    Exact nearest-neighbour search over an in-memory float32 matrix.
+
+    Implements the subset of the Chroma collection API used by ingestion and
+    retrieval (add/upsert/update/delete/get/query/count) and returns squared
+    L2 distances like Chroma's default space, so it is a drop-in replacement.
+    `persist` writes the matrix as .npy (reopened memory-mapped copy-on-write)
+    and the IDs, documents and metadata as JSON. Deleted rows are tombstoned
+    until the next `persist`. Expects a single writing process; readers in
+    other processes reload when the index generation changes.
+    """
+
+    reloadable = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.max_batch_size = WRITE_BATCH_SIZE
+        self.generation = None
+        self._lock = threading.RLock()
+        self._reset()
+        self.load()
+
+    def _reset(self, dimension: int = 0):
+        self._ids = []
+        self._rows = {}
+        self._documents = []
+        self._metadatas = []
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+
+    # -- persistence --
+
+    def _files(self):
+        return os.path.join(self.path, "vectors.npy"), os.path.join(self.path, "records.json")
+
+    def load(self):
+        vectors_path, records_path = self._files()
+        if not (os.path.exists(vectors_path) and os.path.exists(records_path)):
+            return
+        with self._lock:
+            with open(records_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            self._vectors = np.load(vectors_path, mmap_mode="c")
+            self._ids = records["ids"]
+            self._documents = records["documents"]
+            self._metadatas = records["metadatas"]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._alive = np.ones(len(self._ids), dtype=bool)
+            self._norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+
+    def persist(self):
+        with self._lock:
+            self._compact()
+            os.makedirs(self.path, exist_ok=True)
+            vectors_path, records_path = self._files()
+            np.save(f"{vectors_path}.tmp.npy", np.ascontiguousarray(self._vectors))
+            with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas}, f)
+            os.replace(f"{vectors_path}.tmp.npy", vectors_path)
+            os.replace(f"{records_path}.tmp", records_path)
+
+    def _compact(self):
+        if self._alive.all():
+            return
+        keep = np.flatnonzero(self._alive)
+        self._vectors = np.asarray(self._vectors[keep])
+        self._norms = self._norms[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._documents = [self._documents[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._on_rows_changed()
+
+    def _on_rows_changed(self):
+        """Hook for subclasses that keep an index over the rows."""
+
+    # -- collection API --
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """Insert new IDs; IDs that already exist are left unchanged, as in Chroma."""
+        with self._lock:
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._rows]
+            if keep:
+                self._write(
+                    [ids[i] for i in keep],
+                    np.asarray(embeddings, dtype=np.float32)[keep],
+                    [metadatas[i] for i in keep] if metadatas is not None else None,
+                    [documents[i] for i in keep] if documents is not None else None,
+                )
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        with self._lock:
+            self._write(list(ids), np.asarray(embeddings, dtype=np.float32), metadatas, documents)
+
+    def _write(self, ids, vectors, metadatas, documents):
+        if self._vectors.shape[1] == 0 and not self._ids:
+            self._reset(vectors.shape[1])
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+        documents = documents if documents is not None else [""] * len(ids)
+
+        new = []
+        overwritten = False
+        for i, chunk_id in enumerate(ids):
+            row = self._rows.get(chunk_id)
+            if row is None:
+                new.append(i)
+                continue
+            self._ensure_writable()
+            self._vectors[row] = vectors[i]
+            self._norms[row] = vectors[i] @ vectors[i]
+            self._metadatas[row] = metadatas[i]
+            self._documents[row] = documents[i]
+            overwritten = True
+
+        if new:
+            start = len(self._ids)
+            added = vectors[new]
+            self._vectors = np.vstack([self._vectors, added])
+            self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", added, added)])
+            self._alive = np.concatenate([self._alive, np.ones(len(new), dtype=bool)])
+            for offset, i in enumerate(new):
+                self._ids.append(ids[i])
+                self._rows[ids[i]] = start + offset
+                self._metadatas.append(metadatas[i])
+                self._documents.append(documents[i])
+            if not overwritten:
+                self._on_rows_added(start)
+        if overwritten:
+            self._on_rows_changed()
+
+    def _on_rows_added(self, start: int):
+        """Hook: rows from `start` onwards were appended."""
+
+    def _ensure_writable(self):
+        if not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        with self._lock:
+            rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+            known = [i for i, chunk_id in enumerate(ids) if chunk_id in self._rows]
+            for row, i in zip(rows, known):
+                if metadatas is not None:
+                    self._metadatas[row] = metadatas[i]
+                if documents is not None:
+                    self._documents[row] = documents[i]
+            if embeddings is not None:
+                vectors = np.asarray(embeddings, dtype=np.float32)
+                self._ensure_writable()
+                for row, i in zip(rows, known):
+                    self._vectors[row] = vectors[i]
+                    self._norms[row] = vectors[i] @ vectors[i]
+                self._on_rows_changed()
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            targets = list(ids or [])
+            if where:
+                targets += [chunk_id for chunk_id, row in self._rows.items() if _matches(self._metadatas[row], where)]
+            for chunk_id in targets:
+                row = self._rows.pop(chunk_id, None)
+                if row is not None:
+                    self._alive[row] = False
+            if targets:
+                self._on_rows_changed()
+
+    def _select(self, rows, include) -> dict:
+        result = {"ids": [self._ids[row] for row in rows]}
+        result["metadatas"] = [self._metadatas[row] for row in rows] if "metadatas" in include else None
+        result["documents"] = [self._documents[row] for row in rows] if "documents" in include else None
+        result["embeddings"] = np.asarray(self._vectors[rows]) if "embeddings" in include else None
+        return result
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents"), limit: int = None, offset: int = 0) -> dict:
+        with self._lock:
+            if ids is not None:
+                rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+            else:
+                rows = sorted(self._rows.values())
+            if where:
+                rows = [row for row in rows if _matches(self._metadatas[row], where)]
+            # Paging like Chroma's get, so callers can walk a large store in bounded memory
+            rows = rows[offset:offset + limit if limit is not None else None]
+            return self._select(rows, include)
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=("metadatas", "documents", "distances")) -> dict:
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            mask = self._alive.copy()
+            if where:
+                mask &= np.array([_matches(metadata, where) for metadata in self._metadatas], dtype=bool)
+            k = min(n_results, int(mask.sum()))
+            if k == 0:
+                rows = np.empty((len(queries), 0), dtype=np.int64)
+                distances = np.empty((len(queries), 0), dtype=np.float32)
+            else:
+                rows, distances = self._search(queries, k, None if where is None else mask)
+
+            result = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+            for query_rows, query_distances in zip(rows, distances):
+                selected = self._select(list(query_rows), include)
+                result["ids"].append(selected["ids"])
+                result["metadatas"].append(selected["metadatas"])
+                result["documents"].append(selected["documents"])
+                result["distances"].append([float(d) for d in query_distances])
+            return result
+
+    def _search(self, queries: np.ndarray, k: int, mask=None):
+        """Exact top-k by squared L2 over live rows (optionally restricted by `mask`)."""
+        mask = self._alive if mask is None else mask
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2.0 * queries @ np.asarray(self._vectors).T
+            + self._norms[None, :]
+        )
+        distances[:, ~mask] = np.inf
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.maximum(np.take_along_axis(top_distances, order, axis=1), 0.0)
+
+
+class FaissStore(NumpyStore):
+    """
+    NumpyStore whose searches go through a FAISS index: "flat" (exact),
+    "hnsw" or "ivf" (approximate).
+
+    The index covers the live rows; appends are added incrementally to flat and
+    HNSW indexes, while overwrites and deletes rebuild it on the next query.
+    `persist` also writes the index, which `load` reopens memory-mapped.
+    """
+
+    def __init__(self, path: str, kind: str = "flat"):
+        import faiss
+
+        self.faiss = faiss
+        self.kind = kind
+        self._index = None
+        self._positions = None
+        super().__init__(path)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.path, f"faiss-{self.kind}.index")
+
+    def load(self):
+        super().load()
+        path = self._index_path()
+        if self._ids and os.path.exists(path):
+            try:
+                index = self.faiss.read_index(path, self.faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                index = self.faiss.read_index(path)
+            if index.ntotal == len(self._ids):
+                self._set_index(index, np.arange(len(self._ids)))
+
+    def persist(self):
+        with self._lock:
+            super().persist()
+            if self._ids:
+                if self._index is None:
+                    self._build()
+                self.faiss.write_index(self._index, self._index_path())
+
+    def _set_index(self, index, positions):
+        if self.kind == "hnsw":
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif self.kind == "ivf":
+            index.nprobe = IVF_NPROBE
+        self._index = index
+        self._positions = positions
+
+    def _build(self):
+        positions = np.flatnonzero(self._alive)
+        vectors = np.ascontiguousarray(self._vectors[positions], dtype=np.float32)
+        dimension = vectors.shape[1]
+        if self.kind == "hnsw":
+            index = self.faiss.IndexHNSWFlat(dimension, HNSW_M)
+        elif self.kind == "ivf" and len(vectors) >= 64:
+            nlist = max(1, min(int(4 * np.sqrt(len(vectors))), len(vectors) // 39))
+            index = self.faiss.IndexIVFFlat(self.faiss.IndexFlatL2(dimension), dimension, nlist)
+            index.train(vectors)
+        else:
+            index = self.faiss.IndexFlatL2(dimension)
+        index.add(vectors)
+        self._set_index(index, positions)
+
+    def _on_rows_changed(self):
+        self._index = None
+
+    def _on_rows_added(self, start: int):
+        if self._index is not None and self.kind != "ivf" and len(self._positions) == int(self._alive[:start].sum()):
+            self._index.add(np.ascontiguousarray(self._vectors[start:], dtype=np.float32))
+            self._positions = np.concatenate([self._positions, np.arange(start, len(self._ids))])
+        else:
+            self._index = None
+
+    def _search(self, queries: np.ndarray, k: int, mask=None):
+        if mask is not None:
+            return super()._search(queries, k, mask)
+        if self._index is None:
+            self._build()
+        distances, positions = self._index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        rows = np.where(positions >= 0, self._positions[np.maximum(positions, 0)], -1)
+        # Approximate indexes can return fewer than k hits; drop the -1 padding.
+        if (rows < 0).any():
+            keep = (rows >= 0).all(axis=0)
+            rows, distances = rows[:, keep], distances[:, keep]
+        return rows, distances
+
+
+def create_store(backend: str, chroma_path: str, collection_name: str):
+    if backend == "chroma":
+        return ChromaStore(chroma_path, collection_name)
+    path = os.path.join(VECTOR_STORE_PATH, collection_name, backend)
+    if backend == "numpy":
+        return NumpyStore(path)
+    if backend.startswith("faiss-"):
+        return FaissStore(path, kind=backend.split("-", 1)[1])
+    raise ValueError(f"Unknown vector backend: {backend}. Expected one of {', '.join(BACKENDS)}.")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(chroma_path: str, collection_name: str, backend: str = VECTOR_BACKEND):
+    """
+    Return the process-wide store for `collection_name` on `backend`.
+
+    Stores stay open between requests. In-memory backends are reloaded from
+    disk when another process has bumped the index generation.
+    """
+    key = (backend, chroma_path, collection_name)
+    generation = index_generation(chroma_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or (store.reloadable and store.generation != generation):
+            store = create_store(backend, chroma_path, collection_name)
+            store.generation = generation
+            _stores[key] = store
+    return store
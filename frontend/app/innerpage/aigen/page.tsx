@@ -3,10 +3,14 @@
 import React, { useState, useRef } from "react";
 import { FileText, Send, Loader2, Upload } from 'lucide-react';
 
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 const RAGPage = () => {
   const [file, setFile] = useState<File | null>(null);
   const [isProcessing, setIsProcessing] = useState(false);
   const [isReady, setIsReady] = useState(false);
+  const [uploadError, setUploadError] = useState<string | null>(null);
   const [messages, setMessages] = useState<{ role: string; content: string }[]>([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -17,6 +21,7 @@ const RAGPage = () => {
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
       setFile(e.target.files[0]);
+      setUploadError(null);
     }
   };
 
@@ -24,6 +29,7 @@ const RAGPage = () => {
     if (!file) return;
   
     setIsProcessing(true);
+    setUploadError(null);
   
     try {
       const formData = new FormData();
@@ -34,14 +40,33 @@ const RAGPage = () => {
         body: formData,
       });
   
-      const data = await response.json();
-      if (response.ok) {
-        setIsReady(true);
-      } else {
-        console.error("Error:", data.error);
+      let data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || `Upload failed (${response.status})`);
+      }
+      // 202 means ingestion was queued as a background job; poll until it finishes.
+      if (response.status === 202) {
+        const jobId = data.job_id;
+        const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+        while (!["succeeded", "failed", "cancelled"].includes(data.status)) {
+          if (Date.now() > deadline) {
+            throw new Error("Timed out waiting for the document to be processed.");
+          }
+          await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+          const poll = await fetch(`http://localhost:5000/jobs/${jobId}`);
+          data = await poll.json();
+          if (!poll.ok) {
+            throw new Error(data.error || `Job ${jobId} is no longer available (${poll.status})`);
+          }
+        }
+        if (data.status !== "succeeded") {
+          throw new Error(data.error || `Processing ${data.status}.`);
+        }
       }
+      setIsReady(true);
     } catch (error) {
       console.error("Upload failed:", error);
+      setUploadError(error instanceof Error ? error.message : String(error));
     } finally {
       setIsProcessing(false);
     }
@@ -127,6 +152,10 @@ const RAGPage = () => {
                   </div>
                 </div>
               ) : null}
+
+              {uploadError ? (
+                <p className="mb-4 text-sm text-red-600">{uploadError}</p>
+              ) : null}
               
               {!file ? (
                 <button